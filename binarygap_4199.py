@@ -1,6 +1,17 @@
 # This Python program implements the following use case:
 # Write code to find BinaryGap of a given positive integer
 
+import argparse
+import random
+import sys
+import time
+from itertools import islice
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
 def validate_input(n):
     """
     Validate if the input is a positive integer.
@@ -15,9 +26,12 @@ def validate_input(n):
         raise ValueError("Input must be a positive integer.")
     return n
 
-def binary_gap(n):
+def binary_gap_str(n):
     """
-    Calculate the maximum binary gap of a given positive integer.
+    Calculate the maximum binary gap by walking the digits of bin(n).
+
+    This is the original string-based implementation, kept as the reference
+    for the benchmark.
 
     Args:
         n (int): A positive integer.
@@ -47,9 +61,238 @@ def binary_gap(n):
 
     return max_gap
 
-print(binary_gap(5))  # Output: 2
-print(binary_gap(20))  # Output: 1
-print(binary_gap(21))  # Output: 2
-print(binary_gap(22))  # Output: 1
-print(binary_gap(25))  # Output: 2
-print(binary_gap(0))  # Output: 0
\ No newline at end of file
+def _longest_run_of_ones(y):
+    """
+    Length of the longest run of set bits in a non-negative integer.
+
+    Keeping only the bits that start a run of at least `run` ones and then
+    combining `y & (y >> step)` extends that to `run + step`, so the length is
+    found by doubling and then binary search in O(log gap) big-int operations
+    instead of one per bit.
+    """
+    if not y:
+        return 0
+    run = 1
+    while True:
+        doubled = y & (y >> run)
+        if not doubled:
+            break
+        y = doubled
+        run *= 2
+    step = run // 2
+    while step:
+        longer = y & (y >> step)
+        if longer:
+            y = longer
+            run += step
+        step //= 2
+    return run
+
+def binary_gap(n):
+    """
+    Calculate the maximum binary gap of a given positive integer.
+
+    Uses integer bit tricks rather than string conversion, so it stays fast
+    for arbitrary-precision integers.
+
+    Args:
+        n (int): A positive integer.
+
+    Returns:
+        int: The maximum binary gap.
+
+    Raises:
+        ValueError: If the input is not a positive integer.
+    """
+    n = validate_input(n)
+    # Strip trailing zeros: they are not bounded by a one on the right.
+    n >>= (n & -n).bit_length() - 1
+    # Zeros below the highest set bit become ones; their longest run is the gap.
+    zeros = ~n & ((1 << n.bit_length()) - 1)
+    return _longest_run_of_ones(zeros)
+
+def binary_gap_many(values):
+    """
+    Calculate the maximum binary gap of every element of an integer array.
+
+    Works on uint64 NumPy arrays with vectorized bit manipulation: trailing
+    zeros are stripped by dividing by the lowest set bit, the zeros below the
+    highest set bit are turned into ones, and the longest run of ones is
+    measured by repeatedly eroding `y &= y >> 1` on the elements still alive.
+
+    Args:
+        values (array-like): Positive integers below 2**64.
+
+    Returns:
+        numpy.ndarray: The maximum binary gap of each element, as uint8.
+
+    Raises:
+        ValueError: If any element is not a positive integer.
+    """
+    if np is None:
+        raise ImportError("binary_gap_many requires numpy.")
+    x = np.asarray(values)
+    if x.dtype.kind not in "iu":
+        raise ValueError("Input must be an array of positive integers.")
+    invalid = (x == 0) if x.dtype.kind == "u" else (x <= 0)
+    if invalid.any():
+        raise ValueError("Input must be an array of positive integers.")
+
+    shape = x.shape
+    x = x.astype(np.uint64).ravel()
+    one = np.uint64(1)
+    x //= x & (~x + one)
+
+    mask = x.copy()
+    for shift in (1, 2, 4, 8, 16, 32):
+        mask |= mask >> np.uint64(shift)
+    y = ~x & mask
+
+    gaps = np.zeros(x.shape, dtype=np.uint8)
+    alive = np.flatnonzero(y)
+    y = y[alive]
+    while alive.size:
+        gaps[alive] += 1
+        y &= y >> one
+        keep = y != 0
+        alive = alive[keep]
+        y = y[keep]
+    return gaps.reshape(shape)
+
+def _time(label, func, *args):
+    start = time.perf_counter()
+    result = func(*args)
+    elapsed = time.perf_counter() - start
+    print(f"{label:<28} {elapsed * 1000:10.1f} ms")
+    return result
+
+def benchmark(count=1_000_000, big_bits=100_000, seed=0):
+    """
+    Compare the string-based, bit-trick and vectorized implementations.
+
+    Args:
+        count (int): Number of random 63-bit integers to process.
+        big_bits (int): Bit length of the arbitrary-precision scalar case.
+        seed (int): Seed for the random inputs.
+    """
+    rng = random.Random(seed)
+    values = [rng.getrandbits(63) | 1 for _ in range(count)]
+    print(f"--- {count} random 63-bit integers ---")
+    expected = _time("binary_gap_str", lambda: [binary_gap_str(v) for v in values])
+    fast = _time("binary_gap (bit tricks)", lambda: [binary_gap(v) for v in values])
+    assert fast == expected
+    if np is not None:
+        array = np.array(values, dtype=np.uint64)
+        vectorized = _time("binary_gap_many (numpy)", binary_gap_many, array)
+        assert vectorized.tolist() == expected
+
+    big = rng.getrandbits(big_bits) | (1 << big_bits) | 1
+    big |= ((1 << (big_bits // 3)) - 1) << (big_bits // 2)
+    big &= ~(((1 << 5000) - 1) << (big_bits // 4))
+    print(f"--- one {big.bit_length()}-bit integer ---")
+    expected = _time("binary_gap_str", binary_gap_str, big)
+    assert _time("binary_gap (bit tricks)", binary_gap, big) == expected
+
+def parse_values(lines, first_line_number=1, values=None):
+    """
+    Parse one integer per line, skipping blank lines.
+
+    Values are appended to `values` as they are parsed, so a caller passing
+    its own list still has every value before the bad line when this raises.
+
+    Raises:
+        ValueError: If a line is not a positive integer, naming the line.
+    """
+    values = [] if values is None else values
+    for line_number, line in enumerate(lines, first_line_number):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            value = int(line)
+        except ValueError:
+            raise ValueError(f"Line {line_number}: '{line}' is not an integer.") from None
+        if value <= 0:
+            raise ValueError(f"Line {line_number}: input must be a positive integer.")
+        values.append(value)
+    return values
+
+def binary_gaps(values):
+    """Binary gaps of a chunk, vectorized when every value fits in uint64."""
+    if np is not None and values and max(values) < 2 ** 64:
+        return binary_gap_many(np.array(values, dtype=np.uint64)).tolist()
+    return [binary_gap(value) for value in values]
+
+def process_stream(infile, outfile, chunk_size=65536):
+    """
+    Stream integers from `infile` and write one binary gap per line to `outfile`.
+
+    Input is consumed `chunk_size` lines at a time, so memory stays flat no
+    matter how long the input is. If a line is invalid, the gaps of every
+    value before it are written before the error is raised.
+
+    Args:
+        infile (file): Text stream with one positive integer per line.
+        outfile (file): Text stream receiving the gaps.
+        chunk_size (int): Lines processed per batch.
+
+    Returns:
+        int: Number of values processed.
+    """
+    processed = 0
+    line_number = 1
+    while True:
+        lines = list(islice(infile, chunk_size))
+        if not lines:
+            break
+        values = []
+        try:
+            parse_values(lines, line_number, values)
+        finally:
+            gaps = binary_gaps(values)
+            if gaps:
+                outfile.write("\n".join(map(str, gaps)) + "\n")
+            processed += len(gaps)
+            outfile.flush()
+        line_number += len(lines)
+    return processed
+
+def run_examples():
+    for n in (5, 20, 21, 22, 25, 0):
+        try:
+            print(f"binary_gap({n}) = {binary_gap(n)}")
+        except ValueError as e:
+            print(f"binary_gap({n}) -> Error: {e}")
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Print the binary gap of each integer read from a file or stdin, one per line."
+    )
+    parser.add_argument("input", nargs="?", help="Input file, or '-' for stdin.")
+    parser.add_argument("--chunk-size", type=int, default=65536, help="Lines processed per batch.")
+    parser.add_argument("--examples", action="store_true", help="Print a few worked examples.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Compare the string, bit-trick and NumPy implementations.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+        return
+    if args.examples or (args.input is None and sys.stdin.isatty()):
+        run_examples()
+        return
+
+    try:
+        if args.input in (None, "-"):
+            process_stream(sys.stdin, sys.stdout, args.chunk_size)
+        else:
+            with open(args.input) as infile:
+                process_stream(infile, sys.stdout, args.chunk_size)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        sys.exit(1)
+    except BrokenPipeError:
+        sys.stderr.close()
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,290 @@
 # This Python program implements the following use case:
 # Write code to count the number of files in current directory and all its nested sub_directories and print the total count
 
+import argparse
 import os
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
 
-def count_files(directory):
-    try:
-        return sum(len(os.listdir(path)) for path in os.walk(directory))
-    except FileNotFoundError:
+KINDS = ("files", "dirs", "symlinks")
+
+# A cached row is only trusted if the directory was last modified at least
+# this long before it was scanned; filesystems with coarse mtime resolution
+# could otherwise hide a change made in the same tick as the scan.
+MTIME_SLACK_NS = 2_000_000_000
+
+
+def scan_directory(path):
+    """
+    Count the direct entries of a single directory with one os.scandir pass.
+
+    Symlinks are never followed, so a link to a directory is counted as a
+    symlink and not descended into.
+
+    Args:
+        path (str): The directory to scan.
+
+    Returns:
+        tuple: A Counter of entry kinds and the list of sub-directory paths.
+    """
+    counts = Counter()
+    subdirs = []
+    with os.scandir(path) as entries:
+        for entry in entries:
+            try:
+                if entry.is_symlink():
+                    counts["symlinks"] += 1
+                elif entry.is_dir(follow_symlinks=False):
+                    counts["dirs"] += 1
+                    subdirs.append(entry.path)
+                else:
+                    counts["files"] += 1
+            except OSError:
+                counts["errors"] += 1
+    return counts, subdirs
+
+
+class DirectoryIndex:
+    """
+    Persistent per-directory cache of direct entry counts, stored in SQLite.
+
+    A directory's mtime only changes when entries are added, removed or
+    renamed directly inside it, so each row holds the direct counts and the
+    child directory names, validated by (device, inode, mtime). An
+    incremental pass still stats every directory, but only calls os.scandir
+    on the ones whose mtime moved. Paths and child names are stored as the
+    raw bytes from os.fsencode, so names that are not valid UTF-8 round-trip.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        columns = {row[1]: row[2] for row in self.conn.execute("PRAGMA table_info(dirs)")}
+        if columns.get("path") == "TEXT":
+            # Written by an older version that stored paths as text; it is only a cache.
+            self.conn.execute("DROP TABLE dirs")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS dirs ("
+            " path BLOB PRIMARY KEY, dev INTEGER, ino INTEGER, mtime_ns INTEGER,"
+            " scanned_ns INTEGER, files INTEGER, dirs INTEGER, symlinks INTEGER,"
+            " errors INTEGER, children BLOB)"
+        )
+        self.cached = {}
+        self.updated = {}
+        self.seen = set()
+        self.reused = 0
+        self.rescanned = 0
+
+    def load(self, root):
+        """Load every cached row at or below `root` into memory."""
+        root = os.fsencode(root)
+        prefix = root.rstrip(os.fsencode(os.sep)) + os.fsencode(os.sep)
+        rows = self.conn.execute(
+            "SELECT * FROM dirs WHERE path = ? OR substr(path, 1, ?) = ?",
+            (root, len(prefix), prefix),
+        )
+        self.cached = {os.fsdecode(row[0]): row[1:] for row in rows}
+
+    def scan(self, path):
+        """Drop-in replacement for scan_directory that consults the cache."""
+        self.seen.add(path)
+        st = os.stat(path, follow_symlinks=False)
+        row = self.cached.get(path)
+        if (row is not None and row[:3] == (st.st_dev, st.st_ino, st.st_mtime_ns)
+                and st.st_mtime_ns + MTIME_SLACK_NS < row[3]):
+            self.reused += 1
+            files, dirs, symlinks, errors, children = row[4:]
+            counts = Counter(files=files, dirs=dirs, symlinks=symlinks, errors=errors)
+            subdirs = [os.path.join(path, os.fsdecode(name)) for name in children.split(b"\0") if name]
+            return counts, subdirs
+
+        self.rescanned += 1
+        scanned_ns = time.time_ns()
+        counts, subdirs = scan_directory(path)
+        children = b"\0".join(os.fsencode(os.path.basename(sub)) for sub in subdirs)
+        self.updated[path] = (
+            st.st_dev, st.st_ino, st.st_mtime_ns, scanned_ns,
+            counts["files"], counts["dirs"], counts["symlinks"], counts["errors"], children,
+        )
+        return counts, subdirs
+
+    def save(self):
+        """Write rescanned directories and forget the ones that disappeared."""
+        removed = [(os.fsencode(path),) for path in self.cached if path not in self.seen]
+        with self.conn:
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO dirs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                [(os.fsencode(path),) + row for path, row in self.updated.items()],
+            )
+            self.conn.executemany("DELETE FROM dirs WHERE path = ?", removed)
+
+    def close(self):
+        self.conn.close()
+
+
+def walk_parallel(directory, workers=None, on_progress=None, interval=0.5, scan=scan_directory):
+    """
+    Count every entry below a directory using a work-stealing thread pool.
+
+    Each worker owns a deque of pending directories: it pops new work from
+    the tail of its own deque (depth first, good locality) and steals from
+    the head of another worker's deque when it runs dry. os.scandir releases
+    the GIL while it waits on the filesystem, so threads overlap the I/O.
+
+    Args:
+        directory (str): The root directory.
+        workers (int): Number of worker threads. Defaults to 4 x CPU count.
+        on_progress (callable): Called with a snapshot of the running totals
+            every `interval` seconds while the scan is in progress.
+        interval (float): Seconds between progress callbacks.
+        scan (callable): Function returning (counts, subdirs) for one directory.
+
+    Returns:
+        Counter: Totals for 'files', 'dirs', 'symlinks' and 'errors'.
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    queues = [deque() for _ in range(workers)]
+    queues[0].append(directory)
+    totals = Counter()
+    lock = threading.Lock()
+    pending = [1]  # directories queued or being scanned
+    done = threading.Event()
+
+    def steal(index):
+        for offset in range(1, workers):
+            try:
+                return queues[(index + offset) % workers].popleft()
+            except IndexError:
+                continue
+        return None
+
+    def worker(index):
+        own = queues[index]
+        while not done.is_set():
+            try:
+                path = own.pop()
+            except IndexError:
+                path = steal(index)
+                if path is None:
+                    done.wait(0.001)
+                    continue
+            try:
+                counts, subdirs = scan(path)
+            except OSError:
+                counts, subdirs = Counter(errors=1), []
+            # Account for the children before publishing them, otherwise a
+            # thief could finish them and drive `pending` to zero early.
+            with lock:
+                pending[0] += len(subdirs)
+            own.extend(subdirs)
+            with lock:
+                totals.update(counts)
+                pending[0] -= 1
+                if pending[0] == 0:
+                    done.set()
+
+    threads = [threading.Thread(target=worker, args=(i,), daemon=True) for i in range(workers)]
+    for thread in threads:
+        thread.start()
+    if on_progress is not None:
+        while not done.wait(interval):
+            with lock:
+                snapshot = Counter(totals)
+            on_progress(snapshot)
+    for thread in threads:
+        thread.join()
+    return totals
+
+
+def count_entries(directory, workers=None, on_progress=None, interval=0.5, index_path=None):
+    """
+    Count files, directories and symlinks below a directory.
+
+    Args:
+        directory (str): The root directory.
+        workers (int): Number of worker threads.
+        on_progress (callable): Optional callback receiving running totals.
+        interval (float): Seconds between progress callbacks.
+        index_path (str): Optional SQLite index; only directories whose
+            mtime changed since the previous run are rescanned.
+
+    Returns:
+        dict: Counts per kind, or None if the directory does not exist.
+    """
+    if not os.path.isdir(directory):
         print(f"Directory '{directory}' not found.")
         return None
+    if index_path is None:
+        totals = walk_parallel(directory, workers, on_progress, interval)
+    else:
+        directory = os.path.abspath(directory)
+        index = DirectoryIndex(index_path)
+        try:
+            index.load(directory)
+            totals = walk_parallel(directory, workers, on_progress, interval, scan=index.scan)
+            index.save()
+        finally:
+            index.close()
+        print(f"Index: rescanned {index.rescanned} directories, reused {index.reused}.",
+              file=sys.stderr)
+    return {kind: totals[kind] for kind in KINDS + ("errors",)}
+
+
+def count_files(directory, kinds=("files",), workers=None, on_progress=None, index_path=None):
+    """
+    Count the entries of the given kinds in a directory and all its nested sub-directories.
+
+    Args:
+        directory (str): The root directory.
+        kinds (tuple): Any of 'files', 'dirs' and 'symlinks'.
+        workers (int): Number of worker threads.
+        on_progress (callable): Optional callback receiving running totals.
+        index_path (str): Optional SQLite index for incremental counting.
+
+    Returns:
+        int: The total count, or None if the directory does not exist.
+    """
+    counts = count_entries(directory, workers, on_progress, index_path=index_path)
+    if counts is None:
+        return None
+    return sum(counts[kind] for kind in kinds)
+
+
+def print_progress(totals):
+    summary = ", ".join(f"{kind}={totals[kind]}" for kind in KINDS)
+    print(f"... {summary}", file=sys.stderr, flush=True)
+
 
 def main():
-    current_dir = os.getcwd()
-    file_count = count_files(current_dir)
-    if file_count is not None:
-        print(f"Total files in '{current_dir}': {file_count}")
+    parser = argparse.ArgumentParser(description="Count files in a directory tree.")
+    parser.add_argument("directory", nargs="?", default=os.getcwd())
+    parser.add_argument("--kind", choices=KINDS + ("all",), action="append",
+                        help="Entry kind to count (repeatable). Defaults to files.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of scanner threads.")
+    parser.add_argument("--progress", action="store_true",
+                        help="Stream running totals to stderr while scanning.")
+    parser.add_argument("--index", metavar="PATH",
+                        help="SQLite index reused between runs to skip unchanged directories.")
+    args = parser.parse_args()
+
+    kinds = args.kind or ["files"]
+    if "all" in kinds:
+        kinds = list(KINDS)
+    on_progress = print_progress if args.progress else None
+
+    counts = count_entries(args.directory, args.workers, on_progress, index_path=args.index)
+    if counts is None:
+        return
+    if len(kinds) == 1:
+        print(f"Total {kinds[0]} in '{args.directory}': {counts[kinds[0]]}")
+    else:
+        for kind in kinds:
+            print(f"Total {kind} in '{args.directory}': {counts[kind]}")
+    if counts["errors"]:
+        print(f"Skipped {counts['errors']} unreadable entries.", file=sys.stderr)
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
@@ -1,13 +1,18 @@
 import os, getpass
+import argparse
 import asyncio
-import nest_asyncio
-from typing import List
+import json
+from typing import List, Optional
 from dotenv import load_dotenv
 import logging
+from llm_scheduler import RateLimitedScheduler, estimate_tokens
+from knowledge_index import KnowledgeIndex
 
 from langchain_groq import ChatGroq
+from langchain_core.callbacks import UsageMetadataCallbackHandler
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.tools import tool as langchain_tool
+from langchain_core.utils.function_calling import convert_to_openai_tool
 from langchain.agents import create_tool_calling_agent, AgentExecutor
 load_dotenv()
 
@@ -16,36 +21,70 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 try:
     llm = ChatGroq(
         model = "llama-3.1-8b-instant",
-        temperature= 0.1
+        temperature= 0.1,
+        # Retries are owned by the scheduler so backoff is coordinated across calls.
+        max_retries=0,
     )
     
 except Exception as e:
     print(f" Error initializing language model: {e}")
     llm = None
     
+# Facts indexed when no KNOWLEDGE_INDEX_DIR is configured.
+SEED_FACTS = [
+    "The weather in London is currently cloudy with a temperature of 15 C",
+    "The capital of France is Paris.",
+    "The estimated population of Earth is around 8 billion people.",
+    "Mount Everest is the tallest mountain above sea level.",
+]
+
+# Share of the query's content words a fact must contain to be returned.
+# BM25 ranks whatever shares a term with the query, so without this
+# "capital of Germany" would get the France fact.
+MIN_TERM_COVERAGE = 0.6
+
+_knowledge_index = None
+
+def get_knowledge_index() -> KnowledgeIndex:
+    """
+    Load the local knowledge index once per process.
+
+    Uses the memory-mapped index in KNOWLEDGE_INDEX_DIR (built with
+    `python knowledge_index.py build corpus.jsonl DIR`) when set, and an
+    in-memory index over SEED_FACTS otherwise.
+    """
+    global _knowledge_index
+    if _knowledge_index is None:
+        index_dir = os.getenv("KNOWLEDGE_INDEX_DIR")
+        if index_dir and os.path.isdir(index_dir):
+            _knowledge_index = KnowledgeIndex.load(index_dir)
+        else:
+            _knowledge_index = KnowledgeIndex.build(SEED_FACTS)
+    return _knowledge_index
+
 @langchain_tool
 def search_information(query: str) -> str:
     """
     Provides factual information on a given topic. Use this tool to find answers to phrases like 'capital of France' or 'weather in London?'.
     """
     print(f"\n --- Tool called: search_information with query: '{query}' ---")
-    simulated_results = {
-        "weather in london": "The weather in London is currently cloudy with a temperature of 15 C",
-        "capital of france": "The capital of france is Paris. ",
-        "population of earth" : "The estimated population of Earth is around 8 bullion people.",
-        "tallest mountain": "Mount Everest is the tallest mountain above sea level.",
-        "default": f"Simulated search result for '{query}': Np specific information found, but the topic seems interesting. "
-    }
-    result = simulated_results.get(query.lower(), simulated_results["default"])
+    index = get_knowledge_index()
+    matches = [doc for _, doc in index.search(query, k=3) if index.coverage(query, doc) >= MIN_TERM_COVERAGE]
+    if matches:
+        result = matches[0]
+    else:
+        result = f"Simulated search result for '{query}': Np specific information found, but the topic seems interesting. "
     print(f"--- Tool Result: {result} ---")
     return result
 
 tools = [search_information]
 
+AGENT_SYSTEM_PROMPT = "You are a helpful assistant."
+
 # --- Create a Tool calling agent 
 if llm:
     agent_prompt = ChatPromptTemplate.from_messages([
-        ("system", "You are a helpful assistant."),
+        ("system", AGENT_SYSTEM_PROMPT),
         ("human", "{input}"),
         ('placeholder', "{agent_scratchpad}"),
     ])
@@ -54,27 +93,85 @@ if llm:
     agent_executor = AgentExecutor(agent=agent, verbose=True, tools=tools)
 
 
-async def run_agent_with_tool(query: str):
+# A tool-calling run makes two provider requests: one to pick the tool and
+# one to answer from its result.
+LLM_CALLS_PER_QUERY = 2
+
+# Rough sizes for the parts of a run that are not known up front.
+TOOL_CALL_TOKENS = 64
+TOOL_RESULT_TOKENS = 128
+
+def estimate_run_tokens(query: str) -> int:
+    """
+    Token estimate for one agent run, used to reserve TPM budget.
+
+    Both requests send the system prompt, the tool schemas and the query;
+    the first returns a tool call, the second resends that call with the
+    tool result and returns the answer. The scheduler replaces the estimate
+    with the usage actually reported once the run finishes.
+    """
+    context = AGENT_SYSTEM_PROMPT + json.dumps([convert_to_openai_tool(t) for t in tools]) + query
+    pick_tool = estimate_tokens(context, completion_tokens=TOOL_CALL_TOKENS)
+    answer = estimate_tokens(context) + TOOL_CALL_TOKENS + TOOL_RESULT_TOKENS
+    return pick_tool + answer
+
+def total_tokens(usage: UsageMetadataCallbackHandler) -> Optional[int]:
+    """Tokens reported across all models in a run, or None if none were reported."""
+    if not usage.usage_metadata:
+        return None
+    return sum(u.get("total_tokens", 0) for u in usage.usage_metadata.values())
+
+async def run_agent_with_tool(query: str, scheduler: Optional[RateLimitedScheduler] = None):
     """
     Invokes the agent executor with a query and prints the final response.
+
+    When a scheduler is given the run waits for rate-limit budget and is
+    retried on 429/5xx errors.
     """
     print(f"\n-- Running Agent with Query: '{query}' ---")
     try:
-        response = await agent_executor.ainvoke({"input": query})
+        if scheduler is None:
+            response = await agent_executor.ainvoke({"input": query})
+        else:
+            async def attempt():
+                usage = UsageMetadataCallbackHandler()
+                result = await agent_executor.ainvoke({"input": query}, config={"callbacks": [usage]})
+                return result, total_tokens(usage)
+
+            response, _ = await scheduler.submit(
+                attempt,
+                tokens=estimate_run_tokens(query),
+                requests=LLM_CALLS_PER_QUERY,
+                actual_tokens=lambda result: result[1],
+            )
         print("\n--- Final Agent Response ---")
         print(response["output"])
     except Exception as e:
         print(f"\n An error occured during agent execution: {e}")
 
-async def main():
+async def main(queries: Optional[List[str]] = None, scheduler: Optional[RateLimitedScheduler] = None):
     """Runs all agent queries concurrently"""
-    tasks = [
-        run_agent_with_tool("What is the capital of France?"),
-        run_agent_with_tool("what's weather like in London?"),
-        run_agent_with_tool("Tell me something about dogs.")
+    queries = queries or [
+        "What is the capital of France?",
+        "what's weather like in London?",
+        "Tell me something about dogs.",
     ]
+    scheduler = scheduler or RateLimitedScheduler()
+    tasks = [run_agent_with_tool(query, scheduler) for query in queries]
     await asyncio.gather(*tasks)
-    
-# if __name__ == "__main__":
-nest_asyncio.apply()
-asyncio.run(main())
+    print(f"\n--- Scheduler stats: {scheduler.stats()}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the tool-calling agent over many queries.")
+    parser.add_argument("--queries", metavar="FILE", help="File with one query per line.")
+    parser.add_argument("--rpm", type=int, default=30, help="Provider requests-per-minute budget.")
+    parser.add_argument("--tpm", type=int, default=6000, help="Provider tokens-per-minute budget.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Maximum agent runs in flight.")
+    args = parser.parse_args()
+
+    queries = None
+    if args.queries:
+        with open(args.queries) as f:
+            queries = [line.strip() for line in f if line.strip()]
+    scheduler = RateLimitedScheduler(args.rpm, args.tpm, args.concurrency)
+    asyncio.run(main(queries, scheduler))
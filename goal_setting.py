@@ -1,15 +1,24 @@
 import os
+import argparse
+import json
 import random
 import re
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from pydantic import BaseModel, Field, ValidationError, field_validator
 from langchain_groq import ChatGroq
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache
+from sandbox import run_tests
 
 load_dotenv()
 
 llm = ChatGroq(
     model = "llama-3.1-8b-instant",
-    temperature=0.3
+    temperature=0.3,
+    cache=get_llm_cache(semantic=False),
 )
 
 # Utility functions
@@ -68,6 +77,68 @@ def goals_met(feedback_text: str, goals: list[str]) -> bool:
     response = llm.invoke(review_prompt).content.strip().lower()
     return response == "true"
     
+# -- Structured evaluation ---
+# One call returns the critique, a verdict per goal and a filename slug,
+# replacing get_code_feedback + goals_met (and the filename call on save).
+
+class GoalVerdict(BaseModel):
+    goal: str
+    met: bool
+
+class CodeEvaluation(BaseModel):
+    critique: str = Field(description="Review of the code against the goals.")
+    goals: list[GoalVerdict] = Field(description="One verdict per goal, in the order given.")
+    filename: str = Field(description="Lowercase snake_case slug of at most 10 characters.")
+
+    @field_validator("filename")
+    @classmethod
+    def clean_filename(cls, value: str) -> str:
+        slug = re.sub(r"[^a-z0-9_]", "", value.strip().lower().replace(" ", "_"))[:10]
+        if not slug:
+            raise ValueError("filename must contain letters or digits")
+        return slug
+
+    def all_met(self, goals: list[str]) -> bool:
+        return len(self.goals) == len(goals) and all(verdict.met for verdict in self.goals)
+
+def evaluate_code(code: str, goals: list[str], use_case: str, retries: int = 2) -> CodeEvaluation:
+    """
+    Review code against the goals in a single structured LLM call.
+
+    The response must be JSON matching CodeEvaluation; on invalid output the
+    validation error is sent back and the call retried up to `retries` times.
+
+    Raises:
+        ValueError: If no valid evaluation is returned after the retries.
+    """
+    print("Evaluating code against the goals (structured)...")
+    prompt = f"""
+    you are a python code reviewer. A code snippet is shown below. Based on the following goals:
+    {chr(10).join(f"- {g.strip()}" for g in goals)}
+    
+    critique this code for clarity, simplicity, correctness, edge case handling and test coverage,
+    decide for each goal whether it is met, and suggest a lowercase filename slug of at most
+    10 characters for this use case: {use_case}
+    
+    Respond only with JSON of this form:
+    {{"critique": "...", "goals": [{{"goal": "<goal text>", "met": true}}], "filename": "slug"}}
+    Code:
+    {code}
+    """
+    error = None
+    for attempt in range(retries + 1):
+        request = prompt if error is None else f"{prompt}\nYour previous answer was invalid: {error}\nReturn only valid JSON."
+        text = llm.invoke(request).content
+        match = re.search(r"\{.*\}", text, re.DOTALL)
+        try:
+            return CodeEvaluation.model_validate_json(match.group(0) if match else text)
+        except ValidationError as e:
+            error = "; ".join(
+                f"{'.'.join(map(str, err['loc'])) or 'response'}: {err['msg']}" for err in e.errors()
+            ) or "invalid JSON"
+            print(f"Invalid evaluation (attempt {attempt + 1}): {error}")
+    raise ValueError(f"No valid evaluation after {retries + 1} attempts: {error}")
+
 def clean_code_block(code: str) -> str:
     lines = code.strip().splitlines()
     if lines and lines[0].strip().startswith("```"):
@@ -84,15 +155,16 @@ def to_snake_case(text: str) -> str:
     text = re.sub(r"[^a-zA-Z0-9]", "", text)
     return re.sub(r"\s+", "_", text.strip().lower())
 
-def save_code_to_file(code: str, use_case: str) -> str:
+def save_code_to_file(code: str, use_case: str, short_name: str = "") -> str:
     print("Saving final code to file...")
     
-    summary_prompt = (
-        f"Summarize the following use case into a single lowercase word or phrase,"
-        f"no more than 10 characters, suitable for a Python filename:\n\n{use_case}"
-    )
-    raw_summary = llm.invoke(summary_prompt).content.strip()
-    short_name = re.sub(r"[^a-zA-Z0-9_]", "", raw_summary.replace(" ", "_").lower())[:10]
+    if not short_name:
+        summary_prompt = (
+            f"Summarize the following use case into a single lowercase word or phrase,"
+            f"no more than 10 characters, suitable for a Python filename:\n\n{use_case}"
+        )
+        raw_summary = llm.invoke(summary_prompt).content.strip()
+        short_name = re.sub(r"[^a-zA-Z0-9_]", "", raw_summary.replace(" ", "_").lower())[:10]
     
     random_suffix = str(random.randint(1000, 9999))
     filename = f"{short_name}_{random_suffix}.py"
@@ -106,7 +178,7 @@ def save_code_to_file(code: str, use_case: str) -> str:
 
 
 # -- Main Agent Function ---
-def run_code_agent(use_case: str, goals_input: str, max_iterations: int = 5) -> str:
+def run_code_agent(use_case: str, goals_input: str, max_iterations: int = 5, structured: bool = False) -> str:
     goals = [g.strip() for g in goals_input.split(",")]
     
     print(f"\n Use Case: {use_case}")
@@ -116,10 +188,11 @@ def run_code_agent(use_case: str, goals_input: str, max_iterations: int = 5) ->
         
     previous_code = ""
     feedback = ""
+    short_name = ""
     
     for i in range(max_iterations):
         print(f"\n=== Iteration {i + 1} of {max_iterations} ===")
-        prompt = generate_prompt(use_case, goals, previous_code, feedback if isinstance(feedback, str) else feedback.content)
+        prompt = generate_prompt(use_case, goals, previous_code, feedback)
         
         print("Generating code..")
         code_response = llm.invoke(prompt)
@@ -128,11 +201,17 @@ def run_code_agent(use_case: str, goals_input: str, max_iterations: int = 5) ->
         print("\n Generared Code: \n" + "-" * 50 + f"\n{code}\n" + "-" * 50)
         
         print("\n Submitting code for feedback review...")
-        feedback = get_code_feedback(code, goals)
-        feedback_text = feedback.content.strip()
-        print("\n Feedback Received:\n" + "-" * 50 + f"\n{feedback_text}\n" + "-" * 50)
+        if structured:
+            evaluation = evaluate_code(code, goals, use_case)
+            feedback = evaluation.critique.strip()
+            short_name = evaluation.filename
+            met = evaluation.all_met(goals)
+        else:
+            feedback = get_code_feedback(code, goals).content.strip()
+            met = goals_met(feedback, goals)
+        print("\n Feedback Received:\n" + "-" * 50 + f"\n{feedback}\n" + "-" * 50)
         
-        if goals_met(feedback_text, goals):
+        if met:
             print("LLM confirms goal are met. stopping iteration")
             break
         
@@ -140,29 +219,219 @@ def run_code_agent(use_case: str, goals_input: str, max_iterations: int = 5) ->
         previous_code = code
     
     final_code = add_comment_header(code, use_case)
-    return save_code_to_file(final_code, use_case)
+    return save_code_to_file(final_code, use_case, short_name)
+
+
+# -- Parallel candidate mode ---
+# Each round generates several candidates at once and scores them all in
+# parallel, by running them in the sandbox and by LLM review. The best one
+# seeds the next round, and the search stops as soon as a candidate both
+# runs cleanly and meets the goals.
+
+CANDIDATE_HINTS = [
+    "",
+    "Favour the most straightforward implementation.",
+    "Pay particular attention to input validation and edge cases.",
+    "Structure the code as small, well-named functions.",
+    "Keep the code as short as possible while staying readable.",
+]
+
+def candidate_prompt(prompt: str, index: int) -> str:
+    """Vary the prompt per candidate so they differ (and don't share a cache entry)."""
+    hint = CANDIDATE_HINTS[index % len(CANDIDATE_HINTS)]
+    if index >= len(CANDIDATE_HINTS):
+        hint += f" (variant {index})"
+    return prompt + (f"\n {hint}" if hint else "")
+
+def score_candidate(code: str, goals: list[str], tests: list[str], use_case: str = "",
+                    structured: bool = False) -> dict:
+    """
+    Execute and review one candidate; higher `score` is better.
+
+    A candidate whose review never produces a valid evaluation scores zero
+    instead of aborting the round.
+    """
+    execution = run_tests(code, tests, timeout=10, as_main=True)
+    short_name = ""
+    if structured:
+        try:
+            evaluation = evaluate_code(code, goals, use_case)
+        except ValueError as e:
+            print(f"Candidate review failed: {e}")
+            return {"code": code, "feedback": "", "goals_met": False, "execution": execution, "score": 0,
+                    "short_name": ""}
+        feedback_text, met, short_name = evaluation.critique.strip(), evaluation.all_met(goals), evaluation.filename
+    else:
+        feedback_text = get_code_feedback(code, goals).content.strip()
+        met = goals_met(feedback_text, goals)
+    passed = sum(r["ok"] for r in execution["results"])
+    score = 2 * execution["passed"] + met + passed / max(len(tests), 1)
+    return {"code": code, "feedback": feedback_text, "goals_met": met, "execution": execution, "score": score,
+            "short_name": short_name}
+
+def execution_feedback(execution: dict) -> str:
+    if execution["passed"]:
+        return ""
+    if execution["timed_out"]:
+        return "Running the code timed out."
+    failures = [f"{r['test']}: {r['error']}" for r in execution["results"] if not r["ok"]]
+    return "Running the code failed:\n" + "\n".join(failures)
+
+def run_code_agent_parallel(use_case: str, goals_input: str, candidates: int = 3, max_rounds: int = 3,
+                            tests: list[str] = None, structured: bool = False) -> str:
+    """
+    Like `run_code_agent`, but with `candidates` concurrent attempts per round.
+
+    Args:
+        use_case: What the program should do.
+        goals_input: Comma-separated goals.
+        candidates: Candidates generated and scored concurrently per round.
+        max_rounds: Maximum number of rounds.
+        tests: Optional assert statements run against each candidate. The
+            candidate is always executed, so code that crashes scores lower
+            even without tests.
+        structured: Review candidates with one `evaluate_code` call instead
+            of get_code_feedback + goals_met.
+
+    Returns:
+        Path of the saved file.
+    """
+    goals = [g.strip() for g in goals_input.split(",")]
+    tests = tests or []
+    print(f"\n Use Case: {use_case}")
+    print(f"Generating {candidates} candidates per round.")
+
+    best = None
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=candidates) as pool:
+        for round_number in range(max_rounds):
+            print(f"\n=== Round {round_number + 1} of {max_rounds} ===")
+            feedback = ""
+            if best:
+                feedback = "\n".join(filter(None, [best["feedback"], execution_feedback(best["execution"])]))
+            prompt = generate_prompt(use_case, goals, best["code"] if best else "", feedback)
+            responses = llm.batch([candidate_prompt(prompt, i) for i in range(candidates)],
+                                  config={"max_concurrency": candidates})
+            codes = [clean_code_block(response.content.strip()) for response in responses]
+
+            scored = list(pool.map(lambda code: score_candidate(code, goals, tests, use_case, structured), codes))
+            for i, result in enumerate(scored):
+                print(f"  candidate {i + 1}: score {result['score']:.2f}, runs cleanly: "
+                      f"{result['execution']['passed']}, goals met: {result['goals_met']}")
+            round_best = max(scored, key=lambda result: result["score"])
+            if best is None or round_best["score"] >= best["score"]:
+                best = round_best
+            if best["goals_met"] and best["execution"]["passed"]:
+                print(f"Found a passing candidate after {time.perf_counter() - start:.1f}s. stopping iteration")
+                break
+            print("No candidate fully passes. Refining the best one...")
+
+    print("\n Selected Code: \n" + "-" * 50 + f"\n{best['code']}\n" + "-" * 50)
+    final_code = add_comment_header(best["code"], use_case)
+    return save_code_to_file(final_code, use_case, best["short_name"])
+
+
+# -- Evaluation benchmark ---
+
+class CallCountingLLM:
+    """
+    Scripted stand-in for `llm` that counts calls.
+
+    Code is judged to meet the goals from the `passes_at`-th review on, and
+    the first structured answer is deliberately malformed to exercise the
+    retry path.
+    """
+
+    def __init__(self, passes_at: int = 3):
+        self.passes_at = passes_at
+        self.calls = 0
+        self.reviews = 0
+        self.structured_answers = 0
+
+    def invoke(self, prompt):
+        from langchain_core.messages import AIMessage
+        self.calls += 1
+        if "AI coding agent" in prompt:
+            return AIMessage(content="```python\nprint('binary gap')\n```")
+        if "Respond only with JSON" in prompt:
+            self.structured_answers += 1
+            if self.structured_answers == 1:
+                return AIMessage(content="Here is my review: the code looks fine.")
+            self.reviews += 1
+            met = self.reviews >= self.passes_at
+            goals = re.findall(r"^\s*- (.+)$", prompt.split("Code:")[0], re.MULTILINE)
+            return AIMessage(content=json.dumps({
+                "critique": "Looks good." if met else "Handle more edge cases.",
+                "goals": [{"goal": goal, "met": met} for goal in goals],
+                "filename": "binarygap",
+            }))
+        if "python code reviewer" in prompt:
+            self.reviews += 1
+            return AIMessage(content="Looks good." if self.reviews >= self.passes_at else "Handle more edge cases.")
+        if "AI reviewer" in prompt:
+            return AIMessage(content="True" if "Looks good" in prompt else "False")
+        return AIMessage(content="binarygap")
+
+    def batch(self, prompts, config=None):
+        return [self.invoke(prompt) for prompt in prompts]
+
+def benchmark_evaluation(passes_at: int = 3) -> None:
+    """Count LLM calls for the two-call and structured evaluation modes on a scripted run."""
+    global llm
+    original_llm, original_cwd = llm, os.getcwd()
+    use_case = "Write code to find BinaryGap of a given positive integer"
+    goals = "Code simple to understand, functionally correct, handles edge cases"
+    results = {}
+    try:
+        with tempfile.TemporaryDirectory() as workdir:
+            os.chdir(workdir)
+            for structured in (False, True):
+                llm = CallCountingLLM(passes_at)
+                run_code_agent(use_case, goals, structured=structured)
+                results["structured" if structured else "two-call"] = llm.calls
+    finally:
+        llm = original_llm
+        os.chdir(original_cwd)
+    print(f"\nGoals met on review {passes_at}:")
+    for mode, calls in results.items():
+        print(f"  {mode:>10}: {calls} LLM calls ({calls / passes_at:.2f} per iteration, incl. filename)")
+    print("  (the structured run includes one retry after a malformed answer)")
 
 
 if __name__ == "__main__":
-    print("\n Welcome to the AI code Generation Agent")
-    
-    #Example 1
-    use_case_input = "Write code to find BinaryGap of a given positive integer"
-    goals_input = "Code simple to understand, functionally correct, handles comprehensice edge cases, takes postive integer input only, prints the results with few examples"
+    parser = argparse.ArgumentParser(description="Goal-driven code generation agent.")
+    parser.add_argument("--candidates", type=int, default=1,
+                        help="Candidates generated and scored in parallel per round (1 = sequential loop).")
+    parser.add_argument("--structured", action="store_true",
+                        help="Evaluate each version with one structured call instead of two.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Count LLM calls per evaluation mode with a scripted fake LLM.")
+    args = parser.parse_args()
+
+    def run(use_case: str, goals: str) -> str:
+        if args.candidates > 1:
+            return run_code_agent_parallel(use_case, goals, candidates=args.candidates, structured=args.structured)
+        return run_code_agent(use_case, goals, structured=args.structured)
+
+    if args.benchmark:
+        benchmark_evaluation()
+    else:
+        print("\n Welcome to the AI code Generation Agent")
     
-    run_code_agent(use_case_input, goals_input)
+        #Example 1
+        use_case_input = "Write code to find BinaryGap of a given positive integer"
+        goals_input = "Code simple to understand, functionally correct, handles comprehensice edge cases, takes postive integer input only, prints the results with few examples"
     
-    # Examples 2
-    use_case_input = "Write code to count the number of files in current directory and all its nested sub_directories and print the total count"
-    goals_input = (
-        "Code simple to understand, functionally correct, handles comprehensive edge cases, ignore recommendations for performance, ignore recommendations for test suite use like unittest or pytest"
-    )
-    run_code_agent(use_case_input, goals_input)
+        run(use_case_input, goals_input)
     
-    # Example 3
-    use_case_input = "Write code which takes a command line input of a word doc or docx file and opens it and counts the number of words, and characters in it and prints all"
-    goals_input = "Code simple to understand, functionally correct, Handkes edge cases"
-    run_code_agent(use_case_input, goals_input)
+        # Examples 2
+        use_case_input = "Write code to count the number of files in current directory and all its nested sub_directories and print the total count"
+        goals_input = (
+            "Code simple to understand, functionally correct, handles comprehensive edge cases, ignore recommendations for performance, ignore recommendations for test suite use like unittest or pytest"
+        )
+        run(use_case_input, goals_input)
     
-        
-    
\ No newline at end of file
+        # Example 3
+        use_case_input = "Write code which takes a command line input of a word doc or docx file and opens it and counts the number of words, and characters in it and prints all"
+        goals_input = "Code simple to understand, functionally correct, Handkes edge cases"
+        run(use_case_input, goals_input)
@@ -1,8 +1,189 @@
-from google.adk.agents import LlmAgent, ParallelAgent, SequentialAgent
+import asyncio
+import logging
+import os
+from typing import AsyncGenerator, Optional
+
+from google.adk.agents import BaseAgent, LlmAgent, SequentialAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event, EventActions
 from google.adk.tools import google_search
 
 GEMINI_MODEL = "gemini-2.0-flash"
 
+logger = logging.getLogger(__name__)
+
+# Seconds a researcher may take (default 90) and how many researchers run
+# at once (default 8); set either to 0 to remove the limit. Hedging is off
+# unless RESEARCH_HEDGE_AFTER gives the seconds after which a straggler is
+# duplicated, since every duplicate repeats its Gemini and search calls.
+RESEARCH_TIMEOUT = float(os.getenv("RESEARCH_TIMEOUT") or 90)
+RESEARCH_HEDGE_AFTER = float(os.getenv("RESEARCH_HEDGE_AFTER") or 0)
+RESEARCH_MAX_CONCURRENCY = int(os.getenv("RESEARCH_MAX_CONCURRENCY") or 8)
+
+_ATTEMPT_DONE = object()
+
+
+class _Attempt:
+    """One run of a sub-agent (the original or a hedged duplicate)."""
+
+    def __init__(self, agent: BaseAgent):
+        self.agent = agent
+        self.task: Optional[asyncio.Task] = None
+        self.active = True
+
+
+class _Branch:
+    """Bookkeeping for one sub-agent: its attempts and which one won."""
+
+    def __init__(self, agent: BaseAgent):
+        self.agent = agent
+        self.output_key = getattr(agent, "output_key", None)
+        self.attempts: list[_Attempt] = []
+        self.winner: Optional[_Attempt] = None
+        self.finished = asyncio.Event()
+
+
+class ResilientParallelAgent(BaseAgent):
+    """
+    Run sub-agents in parallel like ParallelAgent, with deadlines and hedging.
+
+    Each sub-agent runs on its own branch. A sub-agent still running after
+    `hedge_after` seconds gets a duplicate (a clone with a `_hedge` suffix
+    on its name); whichever copy gives its final response first wins and the
+    other is cancelled, so only one result is written to `output_key`. If
+    the original fails before that, the duplicate starts straight away. A
+    sub-agent that has not answered within `timeout` seconds, or whose
+    attempts all fail, is cancelled and `placeholder` is written to its
+    `output_key` instead, so agents that template on those keys (such as the
+    synthesis agent) still run, on partial results.
+
+    Attributes:
+        timeout: Seconds each sub-agent may run, or None for no limit.
+        hedge_after: Seconds before a straggler is duplicated, or None to
+            never hedge.
+        max_concurrency: Most sub-agents running at once, or None for all.
+            A hedged duplicate shares its sub-agent's slot.
+        placeholder: Value written for sub-agents that produced no result.
+    """
+
+    timeout: Optional[float] = None
+    hedge_after: Optional[float] = None
+    max_concurrency: Optional[int] = None
+    placeholder: str = "No findings available: this research step did not finish in time."
+
+    def _branch_context(self, ctx: InvocationContext, agent: BaseAgent) -> InvocationContext:
+        branch_ctx = ctx.model_copy()
+        suffix = f"{self.name}.{agent.name}"
+        branch_ctx.branch = f"{ctx.branch}.{suffix}" if ctx.branch else suffix
+        return branch_ctx
+
+    async def _run_attempt(self, attempt: _Attempt, branch: _Branch, ctx: InvocationContext,
+                           queue: asyncio.Queue) -> None:
+        error = None
+        try:
+            async for event in attempt.agent.run_async(self._branch_context(ctx, attempt.agent)):
+                resume = asyncio.Event()
+                await queue.put((branch, attempt, event, resume))
+                # Wait until the event is handed to the runner before producing the next one.
+                await resume.wait()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            await queue.put((branch, attempt, _ATTEMPT_DONE, error))
+
+    def _launch(self, branch: _Branch, agent: BaseAgent, ctx: InvocationContext, queue: asyncio.Queue) -> None:
+        attempt = _Attempt(agent)
+        attempt.task = asyncio.create_task(self._run_attempt(attempt, branch, ctx, queue))
+        branch.attempts.append(attempt)
+
+    async def _supervise(self, branch: _Branch, ctx: InvocationContext, queue: asyncio.Queue,
+                         semaphore: Optional[asyncio.Semaphore]) -> None:
+        """Start, hedge and time out one sub-agent, then report it done on the queue."""
+        if semaphore is not None:
+            await semaphore.acquire()
+        aborted = True
+        finished = asyncio.create_task(branch.finished.wait())
+        try:
+            loop = asyncio.get_running_loop()
+            started = loop.time()
+            self._launch(branch, branch.agent, ctx, queue)
+            hedged = self.hedge_after is None
+            while not branch.finished.is_set():
+                live = [a.task for a in branch.attempts if not a.task.done()]
+                if not live and hedged:
+                    break
+                elapsed = loop.time() - started
+                if not hedged and (not live or elapsed >= self.hedge_after):
+                    logger.info("Hedging %s after %.1fs", branch.agent.name, elapsed)
+                    self._launch(branch, branch.agent.clone(update={"name": f"{branch.agent.name}_hedge"}),
+                                 ctx, queue)
+                    hedged = True
+                    continue
+                if self.timeout is not None and elapsed >= self.timeout:
+                    logger.warning("%s timed out after %.1fs", branch.agent.name, elapsed)
+                    break
+                deadlines = [self.timeout] if self.timeout is not None else []
+                if not hedged:
+                    deadlines.append(self.hedge_after)
+                wait = min(deadlines) - elapsed if deadlines else None
+                await asyncio.wait(live + [finished], timeout=wait, return_when=asyncio.FIRST_COMPLETED)
+            aborted = False
+        finally:
+            finished.cancel()
+            # The winner keeps streaming its remaining events, unless the
+            # supervisor itself was cancelled (the run was closed or aborted),
+            # in which case nobody is left to consume them.
+            for attempt in branch.attempts:
+                if aborted or attempt is not branch.winner:
+                    attempt.active = False
+                    attempt.task.cancel()
+            await asyncio.gather(*(a.task for a in branch.attempts), return_exceptions=True)
+            if semaphore is not None:
+                semaphore.release()
+            await queue.put((branch, None, _ATTEMPT_DONE, None))
+
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        if not self.sub_agents:
+            return
+        queue = asyncio.Queue()
+        semaphore = asyncio.Semaphore(self.max_concurrency) if self.max_concurrency else None
+        branches = [_Branch(agent) for agent in self.sub_agents]
+        supervisors = [asyncio.create_task(self._supervise(branch, ctx, queue, semaphore)) for branch in branches]
+        remaining = len(branches)
+        try:
+            while remaining:
+                branch, attempt, event, payload = await queue.get()
+                if event is _ATTEMPT_DONE:
+                    if attempt is None:
+                        remaining -= 1
+                        if branch.winner is None and branch.output_key:
+                            yield Event(
+                                invocation_id=ctx.invocation_id,
+                                author=self.name,
+                                branch=ctx.branch,
+                                actions=EventActions(state_delta={branch.output_key: self.placeholder}),
+                            )
+                    elif payload is not None:
+                        logger.warning("%s failed: %s", attempt.agent.name, payload)
+                    continue
+                # Drop events from attempts that lost the race or were cancelled,
+                # so a late answer cannot overwrite the winner or the placeholder.
+                if not attempt.active or (branch.winner is not None and attempt is not branch.winner):
+                    payload.set()
+                    continue
+                if branch.winner is None and event.author == attempt.agent.name and event.is_final_response():
+                    branch.winner = attempt
+                    branch.finished.set()
+                yield event
+                payload.set()
+        finally:
+            for supervisor in supervisors:
+                supervisor.cancel()
+            await asyncio.gather(*supervisors, return_exceptions=True)
+
+
 # -- 1. Define Researcher Sub-Agents (to run in parallel)
 
 researcher_agent1 = LlmAgent(
@@ -50,10 +231,13 @@ Output *only* the summary.
     output_key="carbon_capture_result"
 )
 
-parallel_research_agent = ParallelAgent(
+parallel_research_agent = ResilientParallelAgent(
     name="ParallelWebResearchAgent",
     sub_agents=[researcher_agent1, researcher_agent_2, researcher_agent_3], 
-    description="Runs multiple research agents in parallel to gather information"
+    description="Runs multiple research agents in parallel to gather information",
+    timeout=RESEARCH_TIMEOUT or None,
+    hedge_after=RESEARCH_HEDGE_AFTER or None,
+    max_concurrency=RESEARCH_MAX_CONCURRENCY or None,
 )
 
 merger_agent = LlmAgent(
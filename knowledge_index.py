@@ -0,0 +1,268 @@
+# Local BM25 knowledge index used by function_calling.search_information.
+# The index is built once, written as flat NumPy arrays and memory-mapped
+# on load, so opening a million-document corpus costs almost nothing.
+
+import argparse
+import itertools
+import json
+import math
+import os
+import random
+import re
+import sys
+import time
+from array import array
+from collections import Counter, defaultdict
+
+import numpy as np
+
+STOPWORDS = frozenset(
+    "a an and are as at be by can could do does for from has have how i in is it its me "
+    "of on or please tell that the there this to was what whats when where which who why "
+    "will with you your".split()
+)
+
+ALPHABET = "abcdefghijklmnopqrstuvwxyz0123456789"
+
+# Posting lists shorter than this are always scored, however common the term.
+MIN_PRUNE_DF = 10_000
+
+FILES = {
+    "postings_docs": np.uint32,
+    "postings_impacts": np.float32,
+    "doc_offsets": np.uint64,
+}
+
+
+def tokenize(text: str) -> list[str]:
+    return [t for t in re.findall(r"[a-z0-9]+", text.lower()) if t not in STOPWORDS]
+
+
+def edits1(word: str) -> set[str]:
+    """All strings one delete, transpose, replace or insert away from `word`."""
+    splits = [(word[:i], word[i:]) for i in range(len(word) + 1)]
+    deletes = [a + b[1:] for a, b in splits if b]
+    transposes = [a + b[1] + b[0] + b[2:] for a, b in splits if len(b) > 1]
+    replaces = [a + c + b[1:] for a, b in splits if b for c in ALPHABET]
+    inserts = [a + c + b for a, b in splits for c in ALPHABET]
+    return set(deletes + transposes + replaces + inserts)
+
+
+class KnowledgeIndex:
+    """
+    BM25 index over a document corpus with typo-tolerant query terms.
+
+    Each posting stores its document id and a precomputed BM25 impact (the
+    tf and length-normalization factor), so a query is one vectorized
+    scatter-add per term followed by a partial sort. Postings and document
+    text are flat arrays, memory-mapped when loaded from disk; only the term
+    dictionary is held as a Python dict. Query terms missing from the
+    vocabulary are replaced by the most frequent term one edit away.
+
+    Args:
+        max_df_ratio: Terms found in more than this fraction of documents
+            (and in at least MIN_PRUNE_DF of them) are skipped when the query
+            has rarer terms; they barely move BM25 scores but dominate the
+            cost of a lookup.
+    """
+
+    def __init__(self, terms, postings_docs, postings_impacts, doc_offsets, docs,
+                 max_df_ratio: float = 0.25):
+        self.terms = terms  # term -> (offset, document frequency)
+        self.postings_docs = postings_docs
+        self.postings_impacts = postings_impacts
+        self.doc_offsets = doc_offsets
+        self.docs = docs
+        self.num_docs = len(doc_offsets) - 1
+        self.max_df_ratio = max_df_ratio
+
+    @classmethod
+    def build(cls, documents, k1: float = 1.2, b: float = 0.75) -> "KnowledgeIndex":
+        """Build an in-memory index from an iterable of document strings."""
+        postings = defaultdict(lambda: (array("I"), array("H")))
+        doc_lens = array("I")
+        doc_offsets = array("Q", [0])
+        blob = bytearray()
+        for doc_id, text in enumerate(documents):
+            counts = Counter(tokenize(text))
+            for term, tf in counts.items():
+                doc_ids, tfs = postings[term]
+                doc_ids.append(doc_id)
+                tfs.append(min(tf, 65535))
+            doc_lens.append(sum(counts.values()))
+            blob += text.encode()
+            doc_offsets.append(len(blob))
+
+        lengths = np.frombuffer(doc_lens, dtype=np.uint32).astype(np.float32)
+        norms = k1 * (1 - b + b * lengths / max(float(lengths.mean()) if len(lengths) else 0.0, 1.0))
+        terms = {}
+        postings_docs = np.empty(sum(len(ids) for ids, _ in postings.values()), dtype=np.uint32)
+        postings_impacts = np.empty(len(postings_docs), dtype=np.float32)
+        offset = 0
+        for term in sorted(postings):
+            doc_ids, tfs = postings.pop(term)
+            ids = np.frombuffer(doc_ids, dtype=np.uint32)
+            tf = np.frombuffer(tfs, dtype=np.uint16).astype(np.float32)
+            postings_docs[offset:offset + len(ids)] = ids
+            postings_impacts[offset:offset + len(ids)] = tf * (k1 + 1) / (tf + norms[ids])
+            terms[term] = (offset, len(ids))
+            offset += len(ids)
+        return cls(terms, postings_docs, postings_impacts,
+                   np.frombuffer(doc_offsets, dtype=np.uint64), bytes(blob))
+
+    def save(self, directory: str) -> None:
+        os.makedirs(directory, exist_ok=True)
+        for name in FILES:
+            np.save(os.path.join(directory, f"{name}.npy"), getattr(self, name))
+        with open(os.path.join(directory, "docs.bin"), "wb") as f:
+            f.write(self.docs)
+        with open(os.path.join(directory, "terms.json"), "w") as f:
+            json.dump(self.terms, f)
+
+    @classmethod
+    def load(cls, directory: str) -> "KnowledgeIndex":
+        """Open a saved index, memory-mapping every array and the document text."""
+        arrays = {name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode="r") for name in FILES}
+        docs_path = os.path.join(directory, "docs.bin")
+        docs = np.memmap(docs_path, dtype=np.uint8, mode="r") if os.path.getsize(docs_path) else b""
+        with open(os.path.join(directory, "terms.json")) as f:
+            terms = json.load(f)
+        return cls(terms, docs=docs, **arrays)
+
+    def document(self, doc_id: int) -> str:
+        start, end = int(self.doc_offsets[doc_id]), int(self.doc_offsets[doc_id + 1])
+        return bytes(self.docs[start:end]).decode()
+
+    def _closest_term(self, token: str):
+        if len(token) < 4:
+            return None
+        candidates = [term for term in edits1(token) if term in self.terms]
+        return max(candidates, key=lambda term: self.terms[term][1], default=None)
+
+    def query_terms(self, query: str) -> list[str]:
+        """Tokenize a query, correcting out-of-vocabulary terms where possible."""
+        resolved = []
+        for token in tokenize(query):
+            term = token if token in self.terms else self._closest_term(token)
+            if term is not None and term not in resolved:
+                resolved.append(term)
+        return resolved
+
+    def coverage(self, query: str, document: str) -> float:
+        """
+        Fraction of the query's content words (3+ characters) that occur in
+        `document`, counting spelling-corrected words as found.
+        """
+        words = [t for t in tokenize(query) if len(t) >= 3]
+        if not words:
+            return 0.0
+        document_terms = set(tokenize(document))
+        found = 0
+        for token in words:
+            term = token if token in self.terms else self._closest_term(token)
+            if token in document_terms or term in document_terms:
+                found += 1
+        return found / len(words)
+
+    def search(self, query: str, k: int = 3) -> list[tuple[float, str]]:
+        """Return up to `k` (score, document) pairs ranked by BM25."""
+        terms = self.query_terms(query)
+        limit = max(self.max_df_ratio * self.num_docs, MIN_PRUNE_DF)
+        rare = [t for t in terms if self.terms[t][1] <= limit]
+        terms = rare or terms
+        if not terms:
+            return []
+
+        doc_ids, weights = [], []
+        for term in terms:
+            offset, df = self.terms[term]
+            idf = math.log(1 + (self.num_docs - df + 0.5) / (df + 0.5))
+            doc_ids.append(self.postings_docs[offset:offset + df])
+            weights.append(np.float32(idf) * self.postings_impacts[offset:offset + df])
+        postings = sum(len(ids) for ids in doc_ids)
+
+        if postings * 8 < self.num_docs:
+            # Few postings: merge them by sorting instead of touching a dense score array.
+            candidates, inverse = np.unique(np.concatenate(doc_ids), return_inverse=True)
+            candidate_scores = np.bincount(inverse, weights=np.concatenate(weights))
+        else:
+            scores = np.zeros(self.num_docs, dtype=np.float32)
+            for ids, w in zip(doc_ids, weights):
+                # Doc ids are unique within one posting list, so fancy-index += is exact.
+                scores[ids] += w
+            candidates = np.unique(np.concatenate(doc_ids))
+            candidate_scores = scores[candidates]
+        if len(candidates) > k:
+            top = np.argpartition(-candidate_scores, k)[:k]
+        else:
+            top = np.arange(len(candidates))
+        top = top[np.argsort(-candidate_scores[top])]
+        return [(float(candidate_scores[i]), self.document(int(candidates[i]))) for i in top]
+
+
+def read_corpus(path: str):
+    """Yield document text from a JSON Lines file ({"text": ...}) or a plain text file, one per line."""
+    with open(path) as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            yield json.loads(line)["text"] if line.startswith("{") else line
+
+
+def synthetic_corpus(count: int, seed: int = 0):
+    rng = random.Random(seed)
+    vocabulary = [f"term{i}" for i in range(50_000)]
+    cum_weights = list(itertools.accumulate(1 / (i + 1) for i in range(len(vocabulary))))
+    for i in range(count):
+        words = rng.choices(vocabulary, cum_weights=cum_weights, k=rng.randint(20, 60))
+        yield f"Document {i}: " + " ".join(words)
+
+
+def benchmark(directory: str, queries: int = 1000, seed: int = 1) -> None:
+    index = KnowledgeIndex.load(directory)
+    rng = random.Random(seed)
+    vocabulary = list(index.terms)
+    latencies = []
+    for _ in range(queries):
+        words = rng.sample(vocabulary, 3)
+        # Introduce a typo in one term to exercise fuzzy matching.
+        words[0] = words[0][:-1] + "x" if len(words[0]) > 4 else words[0]
+        start = time.perf_counter()
+        index.search(" ".join(words))
+        latencies.append(time.perf_counter() - start)
+    latencies.sort()
+    print(f"{index.num_docs} documents, {len(vocabulary)} terms, {queries} queries")
+    print(f"p50 {latencies[len(latencies) // 2] * 1000:.3f} ms, "
+          f"p95 {latencies[int(len(latencies) * 0.95)] * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Build, query or benchmark a local BM25 knowledge index.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Index a corpus file (JSON Lines or one document per line).")
+    build.add_argument("corpus", help="Corpus file, or 'synthetic:N' for N generated documents.")
+    build.add_argument("index_dir")
+    search = sub.add_parser("search", help="Query an index.")
+    search.add_argument("index_dir")
+    search.add_argument("query")
+    search.add_argument("-k", type=int, default=3)
+    bench = sub.add_parser("benchmark", help="Measure query latency on an index.")
+    bench.add_argument("index_dir")
+    bench.add_argument("--queries", type=int, default=1000)
+    args = parser.parse_args()
+
+    if args.command == "build":
+        start = time.perf_counter()
+        if args.corpus.startswith("synthetic:"):
+            documents = synthetic_corpus(int(args.corpus.split(":", 1)[1]))
+        else:
+            documents = read_corpus(args.corpus)
+        index = KnowledgeIndex.build(documents)
+        index.save(args.index_dir)
+        print(f"Indexed {index.num_docs} documents in {time.perf_counter() - start:.1f}s", file=sys.stderr)
+    elif args.command == "search":
+        for score, text in KnowledgeIndex.load(args.index_dir).search(args.query, args.k):
+            print(f"{score:7.3f}  {text}")
+    else:
+        benchmark(args.index_dir, args.queries)
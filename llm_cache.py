@@ -0,0 +1,336 @@
+# Shared response cache for the LangChain chat models in this repo.
+# Pass `cache=get_llm_cache()` to a ChatGroq (or any chat model) to enable it.
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from langchain_core.caches import RETURN_VAL_TYPE, BaseCache
+from langchain_core.messages import message_to_dict, messages_from_dict
+from langchain_core.outputs import ChatGeneration, Generation
+
+
+def split_prompt(prompt: str) -> tuple[str, str]:
+    """
+    Split LangChain's serialized chat prompt into (context, query).
+
+    The query is the text of the last message, the part that varies between
+    requests; the context is everything before it (system prompt, few-shot
+    examples, history). Chat models pass the cache a JSON dump of the
+    message list; any other prompt is treated as a bare query.
+    """
+    try:
+        messages = json.loads(prompt)
+    except ValueError:
+        return "", prompt
+    if not isinstance(messages, list) or not messages:
+        return "", prompt
+    parts = []
+    for message in messages:
+        content = message.get("kwargs", {}).get("content", "") if isinstance(message, dict) else ""
+        if isinstance(content, list):
+            content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+        parts.append(str(content))
+    return "\n".join(parts[:-1]), parts[-1]
+
+
+def _dumps(generations: RETURN_VAL_TYPE) -> str:
+    return json.dumps([
+        {"message": message_to_dict(g.message)} if isinstance(g, ChatGeneration) else {"text": g.text}
+        for g in generations
+    ])
+
+
+def _loads(value: str) -> RETURN_VAL_TYPE:
+    return [
+        ChatGeneration(message=messages_from_dict([g["message"]])[0]) if "message" in g
+        else Generation(text=g["text"])
+        for g in json.loads(value)
+    ]
+
+
+def hashed_embedding(text: str, dim: int = 512) -> list[float]:
+    """
+    Embed text locally by hashing word unigrams and bigrams into `dim` buckets.
+
+    Needs no model or network, which keeps the semantic tier usable offline
+    and in tests; any callable returning a float vector can replace it.
+    """
+    words = re.findall(r"\w+", text.lower())
+    vector = [0.0] * dim
+    for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+        h = zlib.crc32(feature.encode())
+        vector[h % dim] += 1.0 if h & 0x80000000 else -1.0
+    return vector
+
+
+def _normalize(vector: Sequence[float]) -> np.ndarray:
+    vector = np.asarray(vector, dtype=np.float32)
+    norm = float(np.linalg.norm(vector))
+    return vector / norm if norm else vector
+
+
+class SemanticCache(BaseCache):
+    """
+    Two-tier LLM response cache with LRU/TTL eviction and an optional SQLite store.
+
+    Lookups first try an exact match on (llm configuration, prompt). If the
+    semantic tier is enabled, they then fall back to the most similar cached
+    query among prompts with the same configuration and the same context,
+    i.e. every message but the last must match exactly and only the last
+    message is embedded. That keeps fixed template text from making
+    unrelated requests look alike, but the tier is still only safe where the
+    last message is a free-text user query; prompts that embed generated
+    code or other structured content should use an exact-only cache.
+
+    Args:
+        path: SQLite file for the disk tier, or None for memory only.
+        max_entries: Entries kept in memory before the least recently used
+            one is evicted.
+        ttl: Seconds an entry stays valid, or None for no expiry.
+        similarity_threshold: Minimum cosine similarity for a semantic hit,
+            or None (the default) to disable the semantic tier.
+        embed: Function mapping query text to a vector.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        max_entries: int = 1024,
+        ttl: Optional[float] = None,
+        similarity_threshold: Optional[float] = None,
+        embed: Callable[[str], Sequence[float]] = hashed_embedding,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.similarity_threshold = similarity_threshold
+        self.embed = embed
+        self._entries = OrderedDict()  # (llm_string, key) -> (created, value, group, vector)
+        self._groups = {}  # (llm_string, group) -> {(llm_string, key): vector}
+        self._matrices = {}  # (llm_string, group) -> (keys, stacked vectors), rebuilt on change
+        self._lock = threading.Lock()
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+
+        self._conn = None
+        if path:
+            self._conn = sqlite3.connect(path, check_same_thread=False)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses ("
+                " llm_string TEXT, key TEXT, created REAL, value TEXT, vector TEXT, grp TEXT,"
+                " PRIMARY KEY (llm_string, key))"
+            )
+            columns = [row[1] for row in self._conn.execute("PRAGMA table_info(responses)")]
+            if "grp" not in columns:
+                # Files written before context grouping; their vectors covered the whole prompt.
+                self._conn.execute("ALTER TABLE responses ADD COLUMN grp TEXT")
+            self._load()
+
+    @staticmethod
+    def _key(text: str) -> str:
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def _expired(self, created: float) -> bool:
+        return self.ttl is not None and time.time() - created > self.ttl
+
+    def _semantic_key(self, prompt: str) -> tuple[str, str]:
+        """(group, query) for a prompt: a hash of its context and the text to embed."""
+        context, query = split_prompt(prompt)
+        return self._key(context), query
+
+    def _entry_from_row(self, created, value, vector, group):
+        if group is None or not vector:
+            return (created, _loads(value), None, None)
+        return (created, _loads(value), group, np.asarray(json.loads(vector), dtype=np.float32))
+
+    def _load(self):
+        with self._conn:
+            if self.ttl is not None:
+                self._conn.execute("DELETE FROM responses WHERE created < ?", (time.time() - self.ttl,))
+            rows = self._conn.execute(
+                "SELECT llm_string, key, created, value, vector, grp FROM responses"
+                " ORDER BY created DESC LIMIT ?",
+                (self.max_entries,),
+            ).fetchall()
+        for llm_string, key, created, value, vector, group in reversed(rows):
+            self._remember((llm_string, key), self._entry_from_row(created, value, vector, group))
+
+    def _forget(self, cache_key):
+        _, _, group, _ = self._entries.pop(cache_key)
+        if group is not None:
+            group_key = (cache_key[0], group)
+            members = self._groups[group_key]
+            del members[cache_key]
+            if not members:
+                del self._groups[group_key]
+            self._matrices.pop(group_key, None)
+
+    def _remember(self, cache_key, entry):
+        if cache_key in self._entries:
+            self._forget(cache_key)
+        self._entries[cache_key] = entry
+        _, _, group, vector = entry
+        if group is not None and vector is not None:
+            group_key = (cache_key[0], group)
+            self._groups.setdefault(group_key, {})[cache_key] = vector
+            self._matrices.pop(group_key, None)
+        while len(self._entries) > self.max_entries:
+            self._forget(next(iter(self._entries)))
+
+    def _lookup_disk(self, cache_key):
+        row = self._conn.execute(
+            "SELECT created, value, vector, grp FROM responses WHERE llm_string = ? AND key = ?",
+            cache_key,
+        ).fetchone()
+        if row is None or self._expired(row[0]):
+            return None
+        entry = self._entry_from_row(*row)
+        self._remember(cache_key, entry)
+        return entry
+
+    def _group_matrix(self, group_key):
+        matrix = self._matrices.get(group_key)
+        if matrix is None and group_key in self._groups:
+            members = self._groups[group_key]
+            matrix = self._matrices[group_key] = (list(members), np.stack(list(members.values())))
+        return matrix
+
+    def _lookup_similar(self, llm_string: str, group: str, vector: np.ndarray):
+        # Embedding and scoring happen outside the lock; the stacked matrix is
+        # replaced, never modified, so a snapshot stays valid while scoring.
+        with self._lock:
+            matrix = self._group_matrix((llm_string, group))
+        if matrix is None:
+            return None
+        keys, vectors = matrix
+        scores = vectors @ vector
+        best = int(np.argmax(scores))
+        if scores[best] < self.similarity_threshold:
+            return None
+        with self._lock:
+            entry = self._entries.get(keys[best])
+            if entry is None:
+                return None
+            if self._expired(entry[0]):
+                self._forget(keys[best])
+                return None
+            self._entries.move_to_end(keys[best])
+            self.semantic_hits += 1
+            return entry
+
+    def lookup(self, prompt: str, llm_string: str) -> Optional[RETURN_VAL_TYPE]:
+        cache_key = (llm_string, self._key(prompt))
+        with self._lock:
+            entry = self._entries.get(cache_key)
+            if entry is not None and self._expired(entry[0]):
+                self._forget(cache_key)
+                entry = None
+            if entry is None and self._conn is not None:
+                entry = self._lookup_disk(cache_key)
+            if entry is not None:
+                self._entries.move_to_end(cache_key)
+                self.exact_hits += 1
+                return entry[1]
+
+        if self.similarity_threshold is not None:
+            group, query = self._semantic_key(prompt)
+            entry = self._lookup_similar(llm_string, group, _normalize(self.embed(query)))
+            if entry is not None:
+                return entry[1]
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def update(self, prompt: str, llm_string: str, return_val: RETURN_VAL_TYPE) -> None:
+        cache_key = (llm_string, self._key(prompt))
+        group = vector = None
+        if self.similarity_threshold is not None:
+            group, query = self._semantic_key(prompt)
+            vector = _normalize(self.embed(query))
+        created = time.time()
+        with self._lock:
+            self._remember(cache_key, (created, return_val, group, vector))
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)",
+                        (*cache_key, created, _dumps(return_val),
+                         json.dumps(vector.tolist() if vector is not None else []), group),
+                    )
+
+    def clear(self, **kwargs) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._groups.clear()
+            self._matrices.clear()
+            if self._conn is not None:
+                with self._conn:
+                    self._conn.execute("DELETE FROM responses")
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.exact_hits + self.semantic_hits + self.misses
+        return (self.exact_hits + self.semantic_hits) / lookups if lookups else 0.0
+
+    def stats(self) -> dict:
+        """Hit/miss counters and the current number of in-memory entries."""
+        return {
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hit_rate, 3),
+            "entries": len(self._entries),
+        }
+
+
+_default_caches = {}
+
+
+def get_llm_cache(semantic: bool = True) -> SemanticCache:
+    """
+    Return the process-wide cache shared by every module's `llm`.
+
+    Configured through the environment: LLM_CACHE_PATH (SQLite file; unset
+    or empty keeps the cache in memory), LLM_CACHE_TTL (seconds),
+    LLM_CACHE_SIMILARITY (cosine threshold; unset or empty leaves the
+    semantic tier off).
+
+    Args:
+        semantic: Pass False for prompts whose last message is not a free-text
+            query (generated code, critiques, ...); those get an exact-match
+            cache even when LLM_CACHE_SIMILARITY is set.
+    """
+    if semantic not in _default_caches:
+        ttl = os.getenv("LLM_CACHE_TTL")
+        similarity = os.getenv("LLM_CACHE_SIMILARITY") if semantic else None
+        _default_caches[semantic] = SemanticCache(
+            path=os.getenv("LLM_CACHE_PATH") or None,
+            ttl=float(ttl) if ttl else None,
+            similarity_threshold=float(similarity) if similarity else None,
+        )
+    return _default_caches[semantic]
+
+
+if __name__ == "__main__":
+    from langchain_core.language_models.fake_chat_models import FakeListChatModel
+
+    cache = SemanticCache(similarity_threshold=0.95)
+    fake_llm = FakeListChatModel(responses=["Paris", "Rome", "Berlin"], cache=cache)
+    for question in [
+        "What is the capital of France?",
+        "What is the capital of France?",
+        "what is the capital of france ?",
+        "What is the capital of Italy?",
+    ]:
+        print(f"{question!r} -> {fake_llm.invoke(question).content}")
+    print("Cache stats:", cache.stats())
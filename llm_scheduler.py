@@ -0,0 +1,194 @@
+# Rate-limit-aware scheduler for concurrent LLM / agent calls.
+# Keeps requests-per-minute and tokens-per-minute under the provider's budget
+# and retries 429/5xx responses with jittered exponential backoff.
+
+import asyncio
+import random
+import time
+from collections import deque
+from typing import Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+RETRYABLE_ERRORS = ("APIConnectionError", "APITimeoutError", "TimeoutError", "ConnectionError")
+
+
+def status_code(exc: BaseException) -> Optional[int]:
+    """HTTP status carried by an SDK exception (groq, openai, httpx, requests), if any."""
+    status = getattr(exc, "status_code", None)
+    if status is None:
+        status = getattr(getattr(exc, "response", None), "status_code", None)
+    return status if isinstance(status, int) else None
+
+
+def is_retryable(exc: BaseException) -> bool:
+    status = status_code(exc)
+    if status is not None:
+        return status == 429 or status >= 500
+    return type(exc).__name__ in RETRYABLE_ERRORS or isinstance(exc, (asyncio.TimeoutError, ConnectionError))
+
+
+def retry_after(exc: BaseException) -> Optional[float]:
+    """Seconds requested by a Retry-After header, if the error has one."""
+    headers = getattr(getattr(exc, "response", None), "headers", None) or {}
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def percentile(values, pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(pct / 100 * len(ordered)))]
+
+
+class RateLimitedScheduler:
+    """
+    Run coroutines under RPM/TPM budgets, a concurrency cap and retry policy.
+
+    Budgets are enforced over a sliding 60 second window. Each submission
+    declares how many provider requests and tokens it is expected to use;
+    it waits in FIFO order until both fit in the window. Retryable failures
+    (429, 5xx, connection errors) are retried with full-jitter exponential
+    backoff, honouring Retry-After, and a 429 pauses every caller.
+
+    Args:
+        requests_per_minute: Provider request budget.
+        tokens_per_minute: Provider token budget.
+        max_concurrency: Maximum submissions running at once.
+        max_retries: Retries per submission before the error is raised.
+        base_delay: First backoff ceiling in seconds; doubles per attempt.
+        max_delay: Upper bound for a single backoff.
+    """
+
+    def __init__(
+        self,
+        requests_per_minute: int = 30,
+        tokens_per_minute: int = 6000,
+        max_concurrency: int = 8,
+        max_retries: int = 5,
+        base_delay: float = 1.0,
+        max_delay: float = 30.0,
+    ):
+        self.requests_per_minute = requests_per_minute
+        self.tokens_per_minute = tokens_per_minute
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self._window = deque()  # [timestamp, requests, tokens]
+        self._paused_until = 0.0
+        self._acquire_lock = asyncio.Lock()
+        self._concurrency = asyncio.Semaphore(max_concurrency)
+
+        self.queued = 0
+        self.in_flight = 0
+        self.completed = 0
+        self.failed = 0
+        self.retries = 0
+        self.estimated_tokens = 0
+        self.actual_tokens = 0
+        self.wait_times = deque(maxlen=10000)
+        self.latencies = deque(maxlen=10000)
+
+    def _usage(self, now: float) -> tuple[int, int]:
+        while self._window and now - self._window[0][0] >= 60:
+            self._window.popleft()
+        return sum(r for _, r, _ in self._window), sum(t for _, _, t in self._window)
+
+    async def _acquire(self, requests: int, tokens: int) -> list:
+        async with self._acquire_lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                used_requests, used_tokens = self._usage(now)
+                fits = (used_requests + requests <= self.requests_per_minute
+                        and used_tokens + tokens <= self.tokens_per_minute)
+                # An oversized call still runs once the window is empty.
+                if fits or not self._window:
+                    entry = [now, requests, tokens]
+                    self._window.append(entry)
+                    return entry
+                await asyncio.sleep(60 - (now - self._window[0][0]))
+
+    def _backoff(self, attempt: int, exc: BaseException) -> float:
+        delay = random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+        hinted = retry_after(exc)
+        if hinted is not None:
+            delay = max(delay, hinted)
+        if status_code(exc) == 429:
+            self._paused_until = max(self._paused_until, time.monotonic() + delay)
+        return delay
+
+    async def submit(self, func: Callable[[], Awaitable[T]], tokens: int = 0, requests: int = 1,
+                     actual_tokens: Optional[Callable[[T], Optional[int]]] = None) -> T:
+        """
+        Run `func()` once its budget is available, retrying retryable errors.
+
+        Args:
+            func: Zero-argument callable returning a fresh awaitable per attempt.
+            tokens: Estimated tokens the call will consume.
+            requests: Provider requests the call makes (an agent run may make several).
+            actual_tokens: Optional callable reading the tokens really used
+                from a successful result (e.g. from usage_metadata). The
+                window entry is corrected to that figure, so a poor estimate
+                does not skew the budget for the rest of the minute.
+        """
+        submitted = time.monotonic()
+        started = False
+        self.queued += 1
+        try:
+            async with self._concurrency:
+                for attempt in range(self.max_retries + 1):
+                    entry = await self._acquire(requests, tokens)
+                    if not started:
+                        started = True
+                        self.queued -= 1
+                        self.wait_times.append(time.monotonic() - submitted)
+                    self.in_flight += 1
+                    try:
+                        result = await func()
+                    except Exception as exc:
+                        if attempt == self.max_retries or not is_retryable(exc):
+                            self.failed += 1
+                            raise
+                        self.retries += 1
+                        delay = self._backoff(attempt, exc)
+                    else:
+                        self.completed += 1
+                        used = actual_tokens(result) if actual_tokens else None
+                        if used is not None:
+                            self.estimated_tokens += tokens
+                            self.actual_tokens += used
+                            entry[2] = used
+                        return result
+                    finally:
+                        self.in_flight -= 1
+                    await asyncio.sleep(delay)
+        finally:
+            if not started:
+                self.queued -= 1
+            self.latencies.append(time.monotonic() - submitted)
+
+    def stats(self) -> dict:
+        """Queue depth, throughput counters and latency percentiles in seconds."""
+        return {
+            "queue_depth": self.queued,
+            "in_flight": self.in_flight,
+            "completed": self.completed,
+            "failed": self.failed,
+            "retries": self.retries,
+            "estimated_tokens": self.estimated_tokens,
+            "actual_tokens": self.actual_tokens,
+            "wait_p50": round(percentile(self.wait_times, 50), 3),
+            "latency_p50": round(percentile(self.latencies, 50), 3),
+            "latency_p95": round(percentile(self.latencies, 95), 3),
+        }
+
+
+def estimate_tokens(text: str, completion_tokens: int = 256) -> int:
+    """Rough token estimate: ~4 characters per token plus the completion budget."""
+    return len(text) // 4 + completion_tokens
@@ -0,0 +1,229 @@
+# Local stand-in for Groq's OpenAI-compatible chat completions API.
+# Point ChatGroq at it with GROQ_API_BASE=http://127.0.0.1:8008 to exercise
+# agents, schedulers and retry logic without network access or API spend.
+# It also stubs Google Custom Search; set
+# GOOGLE_SEARCH_URL=http://127.0.0.1:8008/customsearch/v1 to use it.
+
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+CHAT_PATH = "/openai/v1/chat/completions"
+SEARCH_PATH = "/customsearch/v1"
+
+
+def tool_arguments(function: dict, content: str) -> dict:
+    """
+    Arguments for a tool call: the first property gets the user's text and
+    any other required properties a placeholder of their declared type, so
+    structured-output schemas validate.
+    """
+    parameters = function.get("parameters", {})
+    properties = parameters.get("properties", {})
+    if not properties:
+        return {"query": content}
+    placeholders = {"string": content, "array": [content], "integer": 0, "number": 0, "boolean": False,
+                    "object": {}}
+    first = next(iter(properties))
+    arguments = {first: content}
+    for name in parameters.get("required", []):
+        if name not in arguments:
+            arguments[name] = placeholders.get(properties[name].get("type"), content)
+    return arguments
+
+
+def build_message(body: dict) -> tuple[dict, str]:
+    """
+    Produce a deterministic assistant message for a chat request.
+
+    If tools are offered and the last message comes from the user, the first
+    tool is called with that text as its first argument; otherwise the
+    reply echoes the last message, which lets agent loops run end to end.
+    """
+    messages = body.get("messages", [])
+    last = messages[-1] if messages else {"role": "user", "content": ""}
+    content = last.get("content") or ""
+    if isinstance(content, list):
+        content = " ".join(part.get("text", "") for part in content if isinstance(part, dict))
+
+    tools = body.get("tools") or []
+    if tools and last.get("role") == "user":
+        function = tools[0]["function"]
+        tool_call = {
+            "id": f"call_{uuid.uuid4().hex[:12]}",
+            "type": "function",
+            "function": {"name": function["name"], "arguments": json.dumps(tool_arguments(function, content))},
+        }
+        return {"role": "assistant", "content": None, "tool_calls": [tool_call]}, "tool_calls"
+    if last.get("role") == "tool":
+        return {"role": "assistant", "content": f"Based on the tool result: {content}"}, "stop"
+    return {"role": "assistant", "content": f"Mock response to: {content}"}, "stop"
+
+
+def search_results(query: str, num: int) -> dict:
+    """Deterministic Custom Search style response for a query."""
+    return {
+        "items": [
+            {
+                "title": f"Result {i + 1} for {query}",
+                "snippet": f"Mock snippet {i + 1} about {query}.",
+                "link": f"https://example.com/{i + 1}?q={'+'.join(query.split())}",
+            }
+            for i in range(num)
+        ]
+    }
+
+
+def usage_for(body: dict, message: dict) -> dict:
+    prompt_tokens = len(json.dumps(body.get("messages", []))) // 4
+    completion_tokens = len(json.dumps(message)) // 4
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+    }
+
+
+class MockLLMHandler(BaseHTTPRequestHandler):
+    error_rate = 0.0
+    latency = 0.0
+    stats = {"requests": 0, "searches": 0, "rate_limited": 0, "server_errors": 0}
+    lock = threading.Lock()
+
+    def log_message(self, format, *args):
+        pass
+
+    def _send_json(self, status: int, payload: dict, headers: dict = None):
+        data = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _maybe_fail(self) -> bool:
+        roll = random.random()
+        if roll >= self.error_rate:
+            return False
+        if roll < self.error_rate / 2:
+            with self.lock:
+                self.stats["rate_limited"] += 1
+            self._send_json(429, {"error": {"message": "Rate limit reached", "type": "tokens"}},
+                            {"retry-after": "1"})
+        else:
+            with self.lock:
+                self.stats["server_errors"] += 1
+            self._send_json(503, {"error": {"message": "Service unavailable"}})
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        if url.path == "/stats":
+            self._send_json(200, self.stats)
+        elif url.path == SEARCH_PATH:
+            params = parse_qs(url.query)
+            with self.lock:
+                self.stats["searches"] += 1
+            if self.latency:
+                time.sleep(random.uniform(0.5, 1.5) * self.latency)
+            if self._maybe_fail():
+                return
+            num = min(max(int(params.get("num", ["1"])[0]), 1), 10)
+            self._send_json(200, search_results(params.get("q", [""])[0], num))
+        else:
+            self._send_json(404, {"error": {"message": "Not found"}})
+
+    def do_POST(self):
+        if self.path != CHAT_PATH:
+            self._send_json(404, {"error": {"message": "Not found"}})
+            return
+        body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        with self.lock:
+            self.stats["requests"] += 1
+        if self.latency:
+            time.sleep(random.uniform(0.5, 1.5) * self.latency)
+        if self._maybe_fail():
+            return
+
+        message, finish_reason = build_message(body)
+        usage = usage_for(body, message)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "mock")
+        if body.get("stream"):
+            self._stream(completion_id, model, message, finish_reason, usage)
+            return
+        self._send_json(200, {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": message, "finish_reason": finish_reason}],
+            "usage": usage,
+        })
+
+    def _stream(self, completion_id, model, message, finish_reason, usage):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+
+        def chunk(delta, finish=None, extra=None):
+            payload = {
+                "id": completion_id,
+                "object": "chat.completion.chunk",
+                "created": int(time.time()),
+                "model": model,
+                "choices": [{"index": 0, "delta": delta, "finish_reason": finish}],
+            }
+            payload.update(extra or {})
+            self.wfile.write(f"data: {json.dumps(payload)}\n\n".encode())
+
+        if message.get("tool_calls"):
+            calls = [dict(call, index=i) for i, call in enumerate(message["tool_calls"])]
+            chunk({"role": "assistant", "tool_calls": calls})
+        else:
+            chunk({"role": "assistant", "content": ""})
+            for word in message["content"].split(" "):
+                chunk({"content": word + " "})
+        chunk({}, finish_reason, {"x_groq": {"id": completion_id, "usage": usage}})
+        self.wfile.write(b"data: [DONE]\n\n")
+
+
+class MockLLMServer(ThreadingHTTPServer):
+    # The default backlog of 5 drops connections under concurrent load,
+    # which shows up as ~1s SYN-retransmit stalls in client latencies.
+    request_queue_size = 128
+    daemon_threads = True
+
+
+def serve(host: str = "127.0.0.1", port: int = 8008, error_rate: float = 0.0,
+          latency: float = 0.0) -> ThreadingHTTPServer:
+    """Start the mock server on a background thread and return it."""
+    MockLLMHandler.error_rate = error_rate
+    MockLLMHandler.latency = latency
+    server = MockLLMServer((host, port), MockLLMHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock Groq chat completions server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8008)
+    parser.add_argument("--error-rate", type=float, default=0.0,
+                        help="Fraction of requests answered with 429 or 503.")
+    parser.add_argument("--latency", type=float, default=0.0, help="Mean response delay in seconds.")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.error_rate, args.latency)
+    print(f"Mock LLM server listening on http://{args.host}:{args.port}{CHAT_PATH}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
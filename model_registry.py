@@ -0,0 +1,173 @@
+# Shared pool of chat model clients with per-model usage accounting.
+# One client (and HTTP connection pool) is kept per model name, and live
+# latency and spend are used to pick which model serves a request.
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Optional
+
+from llm_scheduler import percentile
+
+# USD per million (input, output) tokens on Groq. Update when pricing changes.
+MODEL_PRICES = {
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+    "openai/gpt-oss-20b": (0.10, 0.50),
+    "openai/gpt-oss-120b": (0.15, 0.75),
+}
+
+
+class ModelStats:
+    """Running call, token, cost and latency totals for one model."""
+
+    def __init__(self, window: int = 200):
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost = 0.0
+        self.latencies = deque(maxlen=window)
+        self.last_call = 0.0
+
+    def p95(self) -> Optional[float]:
+        return percentile(self.latencies, 95) if self.latencies else None
+
+    def as_dict(self) -> dict:
+        return {
+            "calls": self.calls,
+            "errors": self.errors,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost, 6),
+            "latency_p50": round(percentile(self.latencies, 50), 3),
+            "latency_p95": round(percentile(self.latencies, 95), 3),
+        }
+
+
+class ModelRegistry:
+    """
+    Keep one warm client per model and route requests by latency and budget.
+
+    Args:
+        factory: Callable building a client for a model name.
+        budget_usd: Total spend allowed across all models, or None for no cap.
+        latency_slo: Recent p95 latency in seconds above which a model is
+            skipped in favour of the next candidate, or None to ignore latency.
+        probe_after: Seconds after which a model skipped for latency is tried
+            again, so it can recover once the provider speeds up.
+        prices: USD per million (input, output) tokens by model name.
+    """
+
+    def __init__(self, factory: Callable, budget_usd: Optional[float] = None,
+                 latency_slo: Optional[float] = None, probe_after: float = 30.0,
+                 prices: dict = MODEL_PRICES):
+        self.factory = factory
+        self.budget_usd = budget_usd
+        self.latency_slo = latency_slo
+        self.probe_after = probe_after
+        self.prices = prices
+        self._clients = {}
+        self._stats = {}
+        self._lock = threading.Lock()
+
+    def get(self, model: str):
+        """Return the shared client for `model`, creating it on first use."""
+        with self._lock:
+            client = self._clients.get(model)
+            if client is None:
+                client = self._clients[model] = self.factory(model)
+                self._stats[model] = ModelStats()
+            return client
+
+    def warm(self, models) -> None:
+        """Create clients ahead of the first request."""
+        for model in models:
+            self.get(model)
+
+    @property
+    def spent(self) -> float:
+        return sum(stats.cost for stats in self._stats.values())
+
+    def estimate_cost(self, model: str, input_tokens: int, output_tokens: int = 512) -> float:
+        input_price, output_price = self.prices.get(model, (0.0, 0.0))
+        return (input_tokens * input_price + output_tokens * output_price) / 1_000_000
+
+    def choose(self, candidates: list[str], input_tokens: int = 0) -> str:
+        """
+        Pick the first candidate that fits the remaining budget and latency SLO.
+
+        Candidates are in order of preference. If none qualifies, the cheapest
+        affordable one is used, falling back to the cheapest overall.
+        """
+        remaining = None if self.budget_usd is None else self.budget_usd - self.spent
+        affordable = [m for m in candidates
+                      if remaining is None or self.estimate_cost(m, input_tokens) <= remaining]
+        now = time.monotonic()
+        for model in affordable:
+            stats = self._stats.get(model)
+            if (self.latency_slo is None or stats is None or not stats.latencies
+                    or stats.p95() <= self.latency_slo or now - stats.last_call > self.probe_after):
+                return model
+        return min(affordable or candidates, key=lambda m: self.estimate_cost(m, input_tokens))
+
+    def _record(self, model: str, started: float, response=None) -> None:
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens", 0)
+        output_tokens = usage.get("output_tokens", 0)
+        with self._lock:
+            stats = self._stats[model]
+            stats.calls += 1
+            stats.last_call = time.monotonic()
+            stats.latencies.append(time.perf_counter() - started)
+            if response is None:
+                stats.errors += 1
+                return
+            stats.input_tokens += input_tokens
+            stats.output_tokens += output_tokens
+            stats.cost += self.estimate_cost(model, input_tokens, output_tokens)
+
+    def invoke(self, model: str, messages, **kwargs):
+        """Invoke `model` through its shared client, recording latency, tokens and cost."""
+        client = self.get(model)
+        started = time.perf_counter()
+        try:
+            response = client.invoke(messages, **kwargs)
+        except Exception:
+            self._record(model, started)
+            raise
+        self._record(model, started, response)
+        return response
+
+    async def ainvoke(self, model: str, messages, **kwargs):
+        """Async variant of `invoke`."""
+        client = self.get(model)
+        started = time.perf_counter()
+        try:
+            response = await client.ainvoke(messages, **kwargs)
+        except Exception:
+            self._record(model, started)
+            raise
+        self._record(model, started, response)
+        return response
+
+    async def astream(self, model: str, messages, **kwargs):
+        """Stream message chunks from `model`, recording usage once the stream ends."""
+        client = self.get(model)
+        started = time.perf_counter()
+        aggregate = None
+        try:
+            async for chunk in client.astream(messages, **kwargs):
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                yield chunk
+        except BaseException:
+            # Also covers cancellation and the consumer closing the stream early.
+            self._record(model, started)
+            raise
+        self._record(model, started, aggregate)
+
+    def stats(self) -> dict:
+        """Per-model usage plus total spend."""
+        with self._lock:
+            models = {model: stats.as_dict() for model, stats in self._stats.items()}
+        return {"models": models, "spent_usd": round(self.spent, 6), "budget_usd": self.budget_usd}
@@ -1,12 +1,22 @@
 import os
+import argparse
 import asyncio
-from typing import Optional
+import json
+import sys
+import threading
+import time
+from typing import AsyncIterator, Callable, Optional
 
 from langchain_groq import ChatGroq
+from langchain_core.callbacks import BaseCallbackHandler, UsageMetadataCallbackHandler
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import Runnable, RunnableParallel, RunnablePassthrough
+from langchain_core.runnables import Runnable, RunnableLambda, RunnableParallel, RunnablePassthrough
+from pydantic import BaseModel, Field
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache
+from llm_scheduler import percentile
+from model_registry import MODEL_PRICES
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
@@ -14,6 +24,7 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 try:
     llm = ChatGroq(
         model = "llama-3.1-8b-instant",
+        cache=get_llm_cache(),
     )
     
 except Exception as e:
@@ -70,24 +81,294 @@ synthesis_prompt = ChatPromptTemplate.from_messages([
 
 full_parallel_chain = map_chain | synthesis_prompt | llm | StrOutputParser()
 
-async def run_parallel_example(topic: str) -> None : 
+# Fused alternative: one structured call replaces the three branch calls,
+# so each topic costs two requests instead of four and the topic text is
+# sent to the model once instead of three times.
+
+class TopicAnalysis(BaseModel):
+    """Summary, questions and key terms for a topic, produced in one call."""
+    summary: str = Field(description="A concise summary of the topic.")
+    questions: list[str] = Field(description="Three interesting questions about the topic.")
+    key_terms: list[str] = Field(description="5-10 key terms from the topic.")
+
+analysis_prompt = ChatPromptTemplate.from_messages([
+    ("system", "For the following topic, write a concise summary, three interesting questions "
+               "and 5-10 key terms."),
+    ("user", "{topic}")
+])
+
+def analysis_to_synthesis_input(inputs: dict) -> dict:
+    """Flatten a TopicAnalysis into the variables synthesis_prompt expects."""
+    analysis = inputs["analysis"]
+    return {
+        "summary": analysis.summary,
+        "questions": "\n".join(analysis.questions),
+        "key_terms": ", ".join(analysis.key_terms),
+        "topic": inputs["topic"],
+    }
+
+fused_map_chain = RunnableParallel({
+    "analysis": analysis_prompt | llm.with_structured_output(TopicAnalysis),
+    "topic": RunnablePassthrough(),
+}) | RunnableLambda(analysis_to_synthesis_input)
+
+fused_chain = fused_map_chain | synthesis_prompt | llm | StrOutputParser()
+
+CHAINS = {"fanout": full_parallel_chain, "fused": fused_chain}
+
+class LLMCallCounter(BaseCallbackHandler):
+    """Count completed chat model calls across a run."""
+
+    def __init__(self):
+        super().__init__()
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def on_llm_end(self, response, **kwargs) -> None:
+        with self._lock:
+            self.calls += 1
+
+async def run_topics(topics: list[str], mode: str = "fanout", concurrency: int = 8,
+                     on_result: Optional[Callable[[dict], None]] = None, callbacks=None) -> list[dict]:
+    """
+    Run the chain for many topics with at most `concurrency` topics in flight.
+
+    In "fanout" mode every topic in flight makes up to three requests at
+    once, so the number of concurrent requests is about 3x `concurrency`.
+
+    Args:
+        topics: Topics to process.
+        mode: "fanout" (three branch calls + synthesis) or "fused" (one
+            structured call + synthesis).
+        concurrency: Maximum topics processed at once.
+        on_result: Called with each result as soon as it is ready, e.g. to
+            write it out, so long runs do not lose finished work.
+        callbacks: LangChain callback handlers attached to every call.
+
+    Returns:
+        One dict per topic with `index`, `topic`, `answer`, `error` and
+        `seconds`, in completion order.
+    """
+    chain = CHAINS[mode]
+    config = {"callbacks": callbacks or []}
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def process(index: int, topic: str) -> dict:
+        async with semaphore:
+            start = time.perf_counter()
+            answer = error = None
+            try:
+                answer = await chain.ainvoke(topic, config=config)
+            except Exception as e:
+                error = str(e)
+            return {"index": index, "topic": topic, "answer": answer, "error": error,
+                    "seconds": round(time.perf_counter() - start, 3)}
+
+    results = []
+    for next_done in asyncio.as_completed([process(i, topic) for i, topic in enumerate(topics)]):
+        result = await next_done
+        if on_result:
+            on_result(result)
+        results.append(result)
+    return results
+
+def usage_cost(usage_by_model: dict) -> float:
+    """USD cost of the usage collected by a UsageMetadataCallbackHandler."""
+    cost = 0.0
+    for model, usage in usage_by_model.items():
+        input_price, output_price = MODEL_PRICES.get(model, (0.0, 0.0))
+        cost += (usage.get("input_tokens", 0) * input_price + usage.get("output_tokens", 0) * output_price) / 1_000_000
+    return cost
+
+async def benchmark_modes(topics: list[str], concurrency: int = 8) -> dict:
+    """
+    Run the same topics through the fan-out and fused chains and compare
+    LLM calls, tokens, cost, wall time and per-topic latency.
+
+    The response cache is switched off for the duration so every call
+    reaches the model.
+    """
+    cache = llm.cache
+    llm.cache = False
+    report = {}
+    try:
+        for mode in CHAINS:
+            usage = UsageMetadataCallbackHandler()
+            counter = LLMCallCounter()
+            start = time.perf_counter()
+            results = await run_topics(topics, mode, concurrency, callbacks=[usage, counter])
+            wall = time.perf_counter() - start
+            latencies = [r["seconds"] for r in results if r["error"] is None]
+            report[mode] = {
+                "topics": len(topics),
+                "errors": sum(r["error"] is not None for r in results),
+                "llm_calls": counter.calls,
+                "input_tokens": sum(u.get("input_tokens", 0) for u in usage.usage_metadata.values()),
+                "output_tokens": sum(u.get("output_tokens", 0) for u in usage.usage_metadata.values()),
+                "cost_usd": round(usage_cost(usage.usage_metadata), 6),
+                "wall_seconds": round(wall, 3),
+                "latency_p50": round(percentile(latencies, 50), 3),
+                "latency_p95": round(percentile(latencies, 95), 3),
+            }
+    finally:
+        llm.cache = cache
+    print(f"\n{'mode':8} {'calls':>6} {'in tok':>8} {'out tok':>8} {'cost $':>9} {'wall s':>7} {'p50 s':>6} {'p95 s':>6} {'errors':>6}")
+    for mode, row in report.items():
+        print(f"{mode:8} {row['llm_calls']:6} {row['input_tokens']:8} {row['output_tokens']:8} {row['cost_usd']:9.6f} "
+              f"{row['wall_seconds']:7.2f} {row['latency_p50']:6.2f} {row['latency_p95']:6.2f} {row['errors']:6}")
+    return report
+
+def read_topics(path: str) -> list[str]:
+    """One topic per non-empty line."""
+    with open(path) as f:
+        return [line.strip() for line in f if line.strip()]
+
+async def run_topics_file(path: str, output: Optional[str], mode: str, concurrency: int) -> None:
+    """Process every topic in `path`, writing JSON lines to `output` (or stdout) as they finish."""
+    topics = read_topics(path)
+    out = open(output, "w") if output else None
+    start = time.perf_counter()
+
+    def write(result: dict) -> None:
+        line = json.dumps(result)
+        if out:
+            out.write(line + "\n")
+        else:
+            print(line)
+
+    try:
+        results = await run_topics(topics, mode, concurrency, on_result=write)
+    finally:
+        if out:
+            out.close()
+    errors = sum(r["error"] is not None for r in results)
+    print(f"Processed {len(results)} topics in {time.perf_counter() - start:.2f}s ({errors} errors, mode={mode}).",
+          file=sys.stderr)
+
+# Incremental mode: branch results are reported as each one finishes, the
+# synthesis streams its tokens, and a branch that misses its deadline is
+# cancelled and replaced by a placeholder so a stalled call cannot hold up
+# the answer.
+
+BRANCHES = {"summary": summarize_chain, "questions": questions_chain, "key_terms": terms_chain}
+
+BRANCH_PLACEHOLDER = "(not available)"
+
+synthesis_chain = synthesis_prompt | llm | StrOutputParser()
+
+async def astream_parallel(topic: str, branch_timeout: Optional[float] = None) -> AsyncIterator[dict]:
+    """
+    Run the three branches concurrently and stream events as they happen.
+
+    Args:
+        topic: The input topic.
+        branch_timeout: Seconds each branch may take, or None to wait for all.
+            Branches still running at the deadline are cancelled and the
+            synthesis runs on the results that arrived.
+
+    Yields:
+        {"type": "branch", "name", "text", "status", "seconds"} once per
+        branch, in completion order; `status` is "ok", "error" or
+        "timeout" and `text` is None unless it is "ok". Then
+        {"type": "token", "text"} for each synthesis chunk.
+    """
+    start = time.perf_counter()
+    tasks = {asyncio.create_task(chain.ainvoke(topic)): name for name, chain in BRANCHES.items()}
+    pending = set(tasks)
+    inputs = {"topic": topic}
+    try:
+        while pending:
+            remaining = None if branch_timeout is None else max(0.0, branch_timeout - (time.perf_counter() - start))
+            done, pending = await asyncio.wait(pending, timeout=remaining, return_when=asyncio.FIRST_COMPLETED)
+            if not done:
+                break
+            for task in done:
+                name = tasks[task]
+                try:
+                    text, status = task.result(), "ok"
+                except Exception as e:
+                    print(f"\n Branch '{name}' failed: {e}")
+                    text, status = None, "error"
+                inputs[name] = text if text is not None else BRANCH_PLACEHOLDER
+                yield {"type": "branch", "name": name, "text": text, "status": status,
+                       "seconds": round(time.perf_counter() - start, 3)}
+        for task in pending:
+            task.cancel()
+            inputs[tasks[task]] = BRANCH_PLACEHOLDER
+            yield {"type": "branch", "name": tasks[task], "text": None, "status": "timeout",
+                   "seconds": round(time.perf_counter() - start, 3)}
+    finally:
+        # Also runs when the consumer stops iterating early.
+        for task in tasks:
+            task.cancel()
+
+    async for chunk in synthesis_chain.astream(inputs):
+        yield {"type": "token", "text": chunk}
+
+async def run_incremental_example(topic: str, branch_timeout: Optional[float] = None) -> None:
+    """Print branch results as they arrive, then stream the synthesized answer."""
+    if not llm:
+        print("LLM not initialized. Cannot run example.")
+        return
+    print(f"\n--- Running incremental Parallel Langchain Example for topic: '{topic}'")
+    start = time.perf_counter()
+    first_token = None
+    try:
+        async for event in astream_parallel(topic, branch_timeout):
+            if event["type"] == "branch":
+                print(f"\n[{event['seconds']:.2f}s] {event['name']} ({event['status']})")
+                if event["text"]:
+                    print(event["text"])
+                continue
+            if first_token is None:
+                first_token = time.perf_counter() - start
+                print("\n Final response")
+            print(event["text"], end="", flush=True)
+        print(f"\n\n First synthesis token after {first_token or 0:.2f}s, done after {time.perf_counter() - start:.2f}s.")
+    except Exception as e:
+        print(f"\n An error occured during chain excecution: {e}")
+
+async def run_parallel_example(topic: str, mode: str = "fanout") -> None : 
     """Asynchronously invokes the parallel processing chain with a specific topic
    and prints the synthesized result.
 
    Args:
        topic: The input topic to be processed by the LangChain chains.
+       mode: "fanout" or "fused", see CHAINS.
     """
     if not llm:
         print("LLM not initialized. Cannot run example.")
         return
     print(f"\n--- Running Parallel Langchain Example for topic: '{topic}'")
     try:
-        response = await full_parallel_chain.ainvoke(topic)
+        response = await CHAINS[mode].ainvoke(topic)
         print("\n Final response")
         print(response)
     except Exception as e:
         print(f"\n An error occured during chain excecution: {e}")
         
 if __name__ == "__main__":
-    test_topic = "The history of space exploration"
-    asyncio.run(run_parallel_example(test_topic))
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Parallel LangChain example.")
+    parser.add_argument("--topic", default="The history of space exploration", help="Topic for a single run.")
+    parser.add_argument("--mode", choices=sorted(CHAINS), default="fanout",
+                        help="Three parallel branch calls, or one fused structured call.")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Print branch results as they finish and stream the synthesis.")
+    parser.add_argument("--branch-timeout", type=float,
+                        help="With --incremental, seconds to wait for the branches before synthesizing without the rest.")
+    parser.add_argument("--topics", help="File with one topic per line to process as a batch.")
+    parser.add_argument("--output", help="With --topics, write JSON lines here instead of stdout.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Topics processed at once in batch runs.")
+    parser.add_argument("--benchmark", type=int, metavar="N",
+                        help="Compare fan-out and fused modes on N topics (from --topics, or generated).")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        topics = read_topics(args.topics) if args.topics else [f"{args.topic} ({i})" for i in range(args.benchmark)]
+        asyncio.run(benchmark_modes(topics[:args.benchmark], args.concurrency))
+    elif args.topics:
+        asyncio.run(run_topics_file(args.topics, args.output, args.mode, args.concurrency))
+    elif args.incremental:
+        asyncio.run(run_incremental_example(args.topic, args.branch_timeout))
+    else:
+        asyncio.run(run_parallel_example(args.topic, args.mode))
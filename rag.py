@@ -1,10 +1,52 @@
+import os
 from google.adk.tools import google_search
+from google.adk.tools.agent_tool import AgentTool
 from google.adk.agents import Agent
+from vector_store import VectorStore
+
+RAG_STORE_DIR = os.getenv("RAG_STORE_DIR", "rag_store")
+
+_store = None
+
+def get_store() -> VectorStore:
+    """Open the local vector store once per process."""
+    global _store
+    if _store is None:
+        _store = VectorStore(RAG_STORE_DIR)
+    return _store
+
+def search_local_documents(query: str) -> dict:
+    """
+    Searches our own indexed documents for passages relevant to the query.
+
+    Args:
+        query: The research question or keywords to look up.
+
+    Returns:
+        A dict with a status and a list of matching passages with their source file.
+    """
+    results = get_store().search(query, k=5)
+    if not results:
+        return {"status": "no_results", "results": []}
+    return {"status": "success", "results": results}
+
+# Built-in tools such as google_search can't share an agent with other tools,
+# so web search runs in its own agent and is exposed as a tool.
+web_search_agent = Agent(
+    name="web_search_assistant",
+    model="gemini-2.0-flash-exp",
+    instruction="Answer the request using the google search tool and cite what you find.",
+    tools=[google_search]
+)
 
 search_agent = Agent(
     name= "research_assistant",
     model="gemini-2.0-flash-exp",
-    instruction="You help users research topics. When asked, use the google search tool",
-    tools=[google_search]
+    instruction=(
+        "You help users research topics. First use the search_local_documents tool to look "
+        "for relevant passages in our own documents. When they don't answer the question, "
+        "use the web_search_assistant tool to search the web."
+    ),
+    tools=[search_local_documents, AgentTool(agent=web_search_agent)]
 )
 
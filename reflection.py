@@ -1,8 +1,13 @@
 import os
+import argparse
+import re
+import time
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.messages import SystemMessage, HumanMessage
+from sandbox import ExecutionVerifier
 
 load_dotenv()
 
@@ -11,17 +16,14 @@ GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 try:
     llm = ChatGroq(
         model = "llama-3.1-8b-instant",
+        cache=get_llm_cache(semantic=False),
     )
-    
+
 except Exception as e:
     print(f" Error initializing language model: {e}")
     llm = None
-    
-def run_reflection_loop():
-    """
-    Demonstrates a multi-step AI reflection loop to progressively imporve a Python Function
-    """
-    task_prompt = """
+
+TASK_PROMPT = """
     Your task is to create a Python function named `calculate_factorial`.
     This function should do the following:
     1.  Accept a single integer `n` as input.
@@ -30,61 +32,250 @@ def run_reflection_loop():
     4.  Handle edge cases: The factorial of 0 is 1.
     5.  Handle invalid input: Raise a ValueError if the input is a negative number.
     """
-    # --- Reflection loop
-    max_iterations = 3
-    current_code = ""
-    
-    message_history = [HumanMessage(content=task_prompt)]
-    
-    for i in range(max_iterations):
-        print("\n" + "="*25 + f"Reflection Loop: Iteration{i + 1}" + "="*25)
-        if i == 0:
-            print("\n >>> Stage 1: Generating initial code...")
-            response = llm.invoke(message_history)
-            current_code = response.content
-        else:
-            print("\n>>> STAGE 1: REFINING Code based on previous critique..")
-            message_history.append(HumanMessage(content="Please refine the code using the critiques provided. "))
-            response = llm.invoke(message_history)
-            current_code = response.content
-        print("\n--- Generated code (v" + str(i+1) + ") --\n" + current_code)
-        message_history.append(response)
-        
-        print("\n>>> STAGE 2: REFLECTING on the generated code...")
-        
-        reflector_prompt = [
-            SystemMessage(content="""
-                        You are a senior software engineer and an expert 
+
+# User-supplied checks for the factorial task; the model adds its own with --generate-tests.
+FACTORIAL_TESTS = [
+    "assert calculate_factorial(0) == 1",
+    "assert calculate_factorial(1) == 1",
+    "assert calculate_factorial(5) == 120",
+    "assert calculate_factorial(10) == 3628800",
+    "assert raises(ValueError, calculate_factorial, -1)",
+    "assert calculate_factorial.__doc__",
+]
+
+PERFECT_MARKER = "CODE_IS_PERFECT"
+
+# Each critic reviews the code from its own angle; their critiques are merged.
+CRITICS = {
+    "reviewer": """
+                        You are a senior software engineer and an expert
                         in Python.
                         Your role is to perform a meticulous code review.
-                        Critically evaluate the provided Python code based 
+                        Critically evaluate the provided Python code based
                         on the original task requirements.
-                        Look for bugs, style issues, missing edge cases, 
+                        Look for bugs, style issues, missing edge cases,
                         and areas for improvement.
                         If the code is perfect and meets all requirements,
                         respond with the single phrase 'CODE_IS_PERFECT'.
                         Otherwise, provide a bulleted list of your critiques.
-                          """),
-            HumanMessage(content=f"Original Task:\n{task_prompt}\n\nCode to Review:\n{current_code}")
+                          """,
+    "tester": """
+                        You are a meticulous QA engineer reviewing Python code.
+                        Check only correctness against the original task:
+                        trace the code on normal inputs, boundary values and
+                        invalid inputs, and report any wrong result or
+                        unhandled case.
+                        If you find no problems, respond with the single
+                        phrase 'CODE_IS_PERFECT'.
+                        Otherwise, provide a bulleted list of the failures.
+                          """,
+    "maintainer": """
+                        You are the maintainer of a Python codebase.
+                        Review the provided code for readability only:
+                        naming, docstrings, structure and needless complexity.
+                        Ignore correctness, which others review.
+                        If nothing needs changing, respond with the single
+                        phrase 'CODE_IS_PERFECT'.
+                        Otherwise, provide a bulleted list of your critiques.
+                          """,
+}
+
+def is_perfect(critique: str) -> bool:
+    """
+    Whether a critique is just the approval token, ignoring case and any
+    surrounding quotes, backticks or punctuation. Prose such as "the code is
+    perfect except ..." is not approval.
+    """
+    return re.fullmatch(r"\W*" + PERFECT_MARKER + r"\W*", critique, re.IGNORECASE) is not None
+
+def merge_critiques(critiques: dict) -> str:
+    """Combine critiques from several critics, dropping approvals and repeated lines."""
+    seen = set()
+    sections = []
+    for name, critique in critiques.items():
+        if is_perfect(critique):
+            continue
+        lines = []
+        for line in critique.strip().splitlines():
+            key = re.sub(r"\W+", " ", line).strip().lower()
+            if key and key in seen:
+                continue
+            seen.add(key)
+            lines.append(line)
+        sections.append(f"[{name}]\n" + "\n".join(lines))
+    return "\n\n".join(sections)
+
+def token_usage(responses) -> tuple[int, int]:
+    """Sum (input, output) tokens from the usage metadata of chat responses."""
+    input_tokens = output_tokens = 0
+    for response in responses:
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens += usage.get("input_tokens", 0)
+        output_tokens += usage.get("output_tokens", 0)
+    return input_tokens, output_tokens
+
+class ReflectionEngine:
+    """
+    Generate code, critique it and refine it until the critics approve.
+
+    Args:
+        llm: Chat model used both to generate and to critique.
+        critics: Names from CRITICS. Several critics run in parallel through
+            `llm.batch` and the code is accepted only when all approve.
+        max_iterations: Upper bound on generate/critique rounds.
+        compaction: "latest" sends only the task, the latest code and its
+            critique when refining, keeping every round the same size;
+            "full" resends the whole conversation as the original loop did.
+        verifier: Optional callable taking the generated answer and returning
+            (passed, critique), e.g. sandbox.ExecutionVerifier. When set, the
+            code is executed first: failures become the critique without an
+            LLM review, and the loop stops as soon as the tests pass.
+        verbose: Print each stage.
+    """
+
+    def __init__(self, llm, critics=("reviewer",), max_iterations: int = 3,
+                 compaction: str = "latest", verifier=None, verbose: bool = True):
+        if compaction not in ("latest", "full"):
+            raise ValueError(f"Unknown compaction mode: {compaction}")
+        self.llm = llm
+        self.critics = list(critics)
+        self.max_iterations = max_iterations
+        self.compaction = compaction
+        self.verifier = verifier
+        self.verbose = verbose
+
+    def _log(self, text: str) -> None:
+        if self.verbose:
+            print(text)
+
+    def refine_messages(self, task: str, history: list, code: str, critique: str) -> list:
+        refine_request = HumanMessage(content="Please refine the code using the critiques provided. ")
+        if self.compaction == "full":
+            return history + [refine_request]
+        return [
+            HumanMessage(content=task),
+            HumanMessage(content=f"Current code:\n{code}"),
+            HumanMessage(content=f"Critique of the previous code:\n{critique}"),
+            refine_request,
         ]
-        
-        critique_response = llm.invoke(reflector_prompt)
-        critique = critique_response.content
-        
-        # --- STOPPING CONDITION
-        
-        if "CODE_is_PERFECT" in critique:
-            print("\n--- Critique ---\n NO further critiques found. The code is satisfactory. ")
-            break
-        
-        print("\n-- Critique --\n" + critique)
-        message_history.append(HumanMessage(content=f"Critique of the previous code:\n{critique}"))
+
+    def critique(self, task: str, code: str) -> tuple[str, bool, list]:
+        """Run every critic on `code` and return (merged critique, approved, responses)."""
+        prompts = [
+            [SystemMessage(content=CRITICS[name]),
+             HumanMessage(content=f"Original Task:\n{task}\n\nCode to Review:\n{code}")]
+            for name in self.critics
+        ]
+        responses = self.llm.batch(prompts) if len(prompts) > 1 else [self.llm.invoke(prompts[0])]
+        critiques = {name: response.content for name, response in zip(self.critics, responses)}
+        approved = all(is_perfect(critique) for critique in critiques.values())
+        return merge_critiques(critiques), approved, responses
+
+    def run(self, task: str) -> dict:
+        """
+        Run the reflection loop on a task.
+
+        Returns:
+            A dict with the final `code`, whether the critics `approved` it,
+            and per-iteration `stats` (latency and token usage for the
+            generate and critique stages).
+        """
+        history = [HumanMessage(content=task)]
+        code = critique = ""
+        approved = False
+        stats = []
+        for i in range(self.max_iterations):
+            self._log("\n" + "="*25 + f"Reflection Loop: Iteration{i + 1}" + "="*25)
+            if i == 0:
+                self._log("\n >>> Stage 1: Generating initial code...")
+                messages = history
+            else:
+                self._log("\n>>> STAGE 1: REFINING Code based on previous critique..")
+                messages = self.refine_messages(task, history, code, critique)
+            start = time.perf_counter()
+            response = self.llm.invoke(messages)
+            generate_seconds = time.perf_counter() - start
+            code = response.content
+            self._log("\n--- Generated code (v" + str(i+1) + ") --\n" + code)
+            if self.compaction == "full":
+                history = messages + [response]
+
+            start = time.perf_counter()
+            if self.verifier is not None:
+                self._log("\n>>> STAGE 2: EXECUTING the generated code against tests...")
+                approved, critique = self.verifier(code)
+                critique_responses = []
+            else:
+                self._log("\n>>> STAGE 2: REFLECTING on the generated code...")
+                critique, approved, critique_responses = self.critique(task, code)
+            critique_seconds = time.perf_counter() - start
+
+            generate_in, generate_out = token_usage([response])
+            critique_in, critique_out = token_usage(critique_responses)
+            stats.append({
+                "iteration": i + 1,
+                "generate_seconds": round(generate_seconds, 3),
+                "critique_seconds": round(critique_seconds, 3),
+                "generate_tokens": {"input": generate_in, "output": generate_out},
+                "critique_tokens": {"input": critique_in, "output": critique_out},
+                "llm_calls": 1 + len(critique_responses),
+            })
+
+            # --- STOPPING CONDITION
+            if approved:
+                if self.verifier is not None:
+                    self._log("\n--- Tests ---\n All tests passed.")
+                else:
+                    self._log("\n--- Critique ---\n NO further critiques found. The code is satisfactory. ")
+                break
+            self._log("\n-- Critique --\n" + critique)
+            if self.compaction == "full":
+                history.append(HumanMessage(content=f"Critique of the previous code:\n{critique}"))
+        return {"code": code, "approved": approved, "stats": stats}
+
+def print_stats(stats: list[dict]) -> None:
+    total_in = total_out = total_calls = 0
+    total_seconds = 0.0
+    for entry in stats:
+        tokens_in = entry["generate_tokens"]["input"] + entry["critique_tokens"]["input"]
+        tokens_out = entry["generate_tokens"]["output"] + entry["critique_tokens"]["output"]
+        seconds = entry["generate_seconds"] + entry["critique_seconds"]
+        total_in, total_out, total_seconds = total_in + tokens_in, total_out + tokens_out, total_seconds + seconds
+        total_calls += entry["llm_calls"]
+        print(f"  iteration {entry['iteration']}: {entry['llm_calls']} LLM calls, {tokens_in} in / {tokens_out} out tokens, "
+              f"generate {entry['generate_seconds']:.2f}s, critique {entry['critique_seconds']:.2f}s")
+    print(f"  total: {total_calls} LLM calls, {total_in} in / {total_out} out tokens, {total_seconds:.2f}s")
+
+def run_reflection_loop(critics=("reviewer",), max_iterations: int = 3, compaction: str = "latest",
+                        execute: bool = False, generate_tests: bool = False):
+    """
+    Demonstrates a multi-step AI reflection loop to progressively imporve a Python Function
+    """
+    verifier = None
+    if execute:
+        verifier = ExecutionVerifier(FACTORIAL_TESTS, llm=llm if generate_tests else None, task=TASK_PROMPT)
+        print(f"Verifying against {len(verifier.tests)} tests.")
+    engine = ReflectionEngine(llm, critics=critics, max_iterations=max_iterations, compaction=compaction,
+                              verifier=verifier)
+    result = engine.run(TASK_PROMPT)
     print("\n" + "="*30 + " FINAL RESULT " + "="*30)
     print("\n Final refined code after the reflection proces: \n")
-    print(current_code)
+    print(result["code"])
+    print("\n Usage per iteration:")
+    print_stats(result["stats"])
+    return result
 
 if __name__ == "__main__":
-    run_reflection_loop()
-    
-    
-        
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Reflection loop example.")
+    parser.add_argument("--critics", nargs="+", default=["reviewer"], choices=sorted(CRITICS),
+                        help="Critics to run in parallel on each version of the code.")
+    parser.add_argument("--iterations", type=int, default=3, help="Maximum reflection rounds.")
+    parser.add_argument("--compaction", choices=("latest", "full"), default="latest",
+                        help="Resend only the latest code and critique, or the full history.")
+    parser.add_argument("--execute", action="store_true",
+                        help="Run the code against tests in a sandbox instead of asking the critics.")
+    parser.add_argument("--generate-tests", action="store_true",
+                        help="With --execute, also ask the model for extra test cases.")
+    args = parser.parse_args()
+
+    run_reflection_loop(args.critics, args.iterations, args.compaction, args.execute, args.generate_tests)
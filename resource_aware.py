@@ -1,8 +1,19 @@
 import os
-import requests
+import argparse
+import asyncio
 import json
+import math
+import random
+import re
+import time
+import zlib
+from collections import Counter
+from typing import Optional
 from dotenv import load_dotenv
 from langchain_groq import ChatGroq
+from web_search import create_search_client
+from model_registry import ModelRegistry
+from llm_scheduler import estimate_tokens, percentile
 
 load_dotenv()
 
@@ -20,11 +31,191 @@ def create_groq(model:str):
         temperature = 0.1
     )
 
-client = create_groq(model="llama-3.3-70b-versatile")
+CLASSIFIER_MODEL = "llama-3.3-70b-versatile"
+
+# Models able to serve each classification, in order of preference. The
+# registry falls through to later entries when the budget runs low or a
+# model's recent latency exceeds MODEL_LATENCY_SLO.
+MODEL_ROUTES = {
+    "simple": ["llama-3.3-70b-versatile", "llama-3.1-8b-instant"],
+    "reasoning": ["openai/gpt-oss-120b", "openai/gpt-oss-20b"],
+    "internet_search": ["openai/gpt-oss-20b", "llama-3.1-8b-instant"],
+}
+
+registry = ModelRegistry(
+    create_groq,
+    budget_usd=float(os.environ["MODEL_BUDGET_USD"]) if os.getenv("MODEL_BUDGET_USD") else None,
+    latency_slo=float(os.environ["MODEL_LATENCY_SLO"]) if os.getenv("MODEL_LATENCY_SLO") else None,
+)
+registry.warm([CLASSIFIER_MODEL])
 
 # --- step 1: Classify the prompt ---
+# Most prompts are classified in-process: keyword rules catch the obvious
+# ones and a softmax model over hashed word and character n-grams, trained
+# on the labeled examples below, handles the rest. Only prompts the local
+# model is unsure about are sent to CLASSIFIER_MODEL.
 
-def classify_prompt(prompt: str) -> dict:
+CATEGORIES = ("simple", "reasoning", "internet_search")
+
+SEARCH_RULE = re.compile(
+    r"\b(latest|current(ly)?|today|tonight|tomorrow|yesterday|this (week|month|year|season)|"
+    r"right now|this weekend|news|headlines|weather|forecast|stock price|exchange rate|score|standings|"
+    r"upcoming|recent(ly)?|20[2-9]\d)\b", re.IGNORECASE)
+REASONING_RULE = re.compile(
+    r"\b(explain|why|prove|derive|calculate|compute|solve|compare|analy[sz]e|evaluate|"
+    r"implications?|impact of|trade-?offs?|step by step|pros and cons|reason)\b"
+    r"|\d\s*([-+*/^]|times|plus|minus|divided by)\s*\d", re.IGNORECASE)
+
+CLASSIFIER_EXAMPLES = [
+    ("What is the capital of Australia?", "simple"),
+    ("Who wrote Romeo and Juliet?", "simple"),
+    ("How many legs does a spider have?", "simple"),
+    ("What is the chemical symbol for gold?", "simple"),
+    ("Translate 'good morning' into French.", "simple"),
+    ("What is the boiling point of water?", "simple"),
+    ("Name the largest ocean on Earth.", "simple"),
+    ("Who painted the Mona Lisa?", "simple"),
+    ("What does HTML stand for?", "simple"),
+    ("How many days are in a leap year?", "simple"),
+    ("What language is spoken in Brazil?", "simple"),
+    ("Give me a synonym for happy.", "simple"),
+    ("What is the square root of 81?", "simple"),
+    ("Which continent is Egypt in?", "simple"),
+    ("Spell the word necessary.", "simple"),
+    ("Who was the first man on the moon?", "simple"),
+    ("Explain the impact of quantum computing on cryptography.", "reasoning"),
+    ("If a train leaves at 3pm going 60 mph, when does it cover 150 miles?", "reasoning"),
+    ("Why do heavier objects not fall faster in a vacuum?", "reasoning"),
+    ("Compare the trade-offs between microservices and a monolith.", "reasoning"),
+    ("Solve for x: 3x + 7 = 22.", "reasoning"),
+    ("Prove that the square root of 2 is irrational.", "reasoning"),
+    ("What are the pros and cons of nuclear energy?", "reasoning"),
+    ("Analyze the causes of the 2008 financial crisis.", "reasoning"),
+    ("Plan a study schedule that covers calculus in six weeks.", "reasoning"),
+    ("How would you design a rate limiter for an API?", "reasoning"),
+    ("Walk me through how a hash map handles collisions.", "reasoning"),
+    ("Which is larger, 2 to the power 10 or 10 squared, and by how much?", "reasoning"),
+    ("Evaluate whether remote work improves productivity.", "reasoning"),
+    ("Derive the formula for the area of a circle.", "reasoning"),
+    ("What would happen to the economy if interest rates doubled?", "reasoning"),
+    ("Write a logic puzzle solution: who owns the zebra?", "reasoning"),
+    ("When does the australian open 2026 start, give me full date?", "internet_search"),
+    ("What is the weather in Lagos tomorrow?", "internet_search"),
+    ("Who won the football match last night?", "internet_search"),
+    ("What is the current price of bitcoin?", "internet_search"),
+    ("Latest news about the Mars mission.", "internet_search"),
+    ("What are today's top headlines?", "internet_search"),
+    ("Who is the current prime minister of the UK?", "internet_search"),
+    ("What movies are showing in cinemas this week?", "internet_search"),
+    ("What is the exchange rate from dollars to naira right now?", "internet_search"),
+    ("When is the next iPhone being released?", "internet_search"),
+    ("What are the standings in the Premier League?", "internet_search"),
+    ("Did the central bank change rates this month?", "internet_search"),
+    ("What is trending on social media today?", "internet_search"),
+    ("Find recent reviews of the new Tesla model.", "internet_search"),
+    ("What time does the store open on Sunday near me?", "internet_search"),
+    ("Who won the Nobel Prize in Physics this year?", "internet_search"),
+]
+
+def hashed_features(text: str, dim: int) -> dict:
+    """Hashed word unigram/bigram and character trigram counts, L2-normalized."""
+    words = re.findall(r"[a-z0-9']+", text.lower())
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    for word in words:
+        padded = f"#{word}#"
+        grams.extend(padded[i:i + 3] for i in range(len(padded) - 2))
+    counts = Counter(zlib.crc32(gram.encode()) % dim for gram in grams)
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {index: c / norm for index, c in counts.items()}
+
+class HashedSoftmaxClassifier:
+    """
+    Multinomial logistic regression over hashed n-gram features.
+
+    Trained with plain SGD at construction time; with a few dozen examples
+    this takes milliseconds and inference costs microseconds.
+
+    Args:
+        examples: (text, label) training pairs.
+        dim: Number of hash buckets.
+        epochs: Passes over the training data.
+        learning_rate: SGD step size.
+        l2: Weight decay applied to the features touched by each step.
+    """
+
+    def __init__(self, examples: list[tuple[str, str]], dim: int = 1 << 14, epochs: int = 40,
+                 learning_rate: float = 0.5, l2: float = 1e-4):
+        self.dim = dim
+        self.labels = sorted({label for _, label in examples})
+        self.weights = [[0.0] * dim for _ in self.labels]
+        self.bias = [0.0] * len(self.labels)
+        data = [(hashed_features(text, dim), self.labels.index(label)) for text, label in examples]
+        rng = random.Random(0)
+        for _ in range(epochs):
+            rng.shuffle(data)
+            for features, target in data:
+                probs = self._probabilities(features)
+                for k, p in enumerate(probs):
+                    gradient = p - (k == target)
+                    row = self.weights[k]
+                    for index, value in features.items():
+                        row[index] -= learning_rate * (gradient * value + l2 * row[index])
+                    self.bias[k] -= learning_rate * gradient
+
+    def _probabilities(self, features: dict) -> list[float]:
+        logits = [b + sum(row[i] * v for i, v in features.items()) for row, b in zip(self.weights, self.bias)]
+        top = max(logits)
+        exps = [math.exp(logit - top) for logit in logits]
+        total = sum(exps)
+        return [e / total for e in exps]
+
+    def probabilities(self, text: str) -> dict:
+        """Probability of each label for `text`."""
+        return dict(zip(self.labels, self._probabilities(hashed_features(text, self.dim))))
+
+    def predict(self, text: str) -> tuple[str, float]:
+        """Return the most likely label and its probability."""
+        probs = self.probabilities(text)
+        best = max(probs, key=probs.get)
+        return best, probs[best]
+
+local_classifier = HashedSoftmaxClassifier(CLASSIFIER_EXAMPLES)
+
+def classify_locally(prompt: str, min_confidence: float = 0.6) -> Optional[str]:
+    """
+    Classify a prompt in-process, or return None when the LLM should decide.
+
+    A keyword rule wins when exactly one fires; otherwise the softmax model
+    answers if its top probability reaches `min_confidence`.
+    """
+    search = bool(SEARCH_RULE.search(prompt))
+    reasoning = bool(REASONING_RULE.search(prompt))
+    if search != reasoning:
+        return "internet_search" if search else "reasoning"
+    label, confidence = local_classifier.predict(prompt)
+    return label if confidence >= min_confidence else None
+
+def parse_classification(text: str) -> str:
+    """
+    Extract a category from LLM output, tolerating prose or code fences around the JSON.
+
+    Falls back to 'simple' when no category can be found.
+    """
+    match = re.search(r"\{.*?\}", text, re.DOTALL)
+    if match:
+        try:
+            value = str(json.loads(match.group(0)).get("classification", "")).strip().lower()
+            if value in CATEGORIES:
+                return value
+        except (json.JSONDecodeError, AttributeError):
+            pass
+    for category in ("internet_search", "reasoning", "simple"):
+        if re.search(category.replace("_", "[ _]"), text, re.IGNORECASE):
+            return category
+    print(f"Could not parse classification from {text!r}; using 'simple'.")
+    return "simple"
+
+def llm_classification_messages(prompt: str) -> list[dict]:
     system_message = {
         "role" : "system",
         "content":(
@@ -42,51 +233,31 @@ def classify_prompt(prompt: str) -> dict:
     }
     
     user_message = {"role":"user", "content": prompt}
+    return [system_message, user_message]
+
+def classify_prompt(prompt: str) -> dict:
+    classification = classify_locally(prompt)
+    if classification is not None:
+        return {"classification": classification, "source": "local"}
     
-    response = client.invoke([system_message, user_message])
+    response = registry.invoke(CLASSIFIER_MODEL, llm_classification_messages(prompt))
     content = response.content
     
-    return json.loads(content)
+    return {"classification": parse_classification(content), "source": "llm"}
 
 # -- step 2: Google search ---
+search_client = create_search_client(GOOGLE_CUSTOM_SEARCH_API_KEY, GOOGLE_CSE_ID)
+
 def google_search(query: str, num_results = 1) -> list:
-    url = "https://www.googleapis.com/customsearch/v1"
-    params = {
-        "key": GOOGLE_CUSTOM_SEARCH_API_KEY,
-        "cx" : GOOGLE_CSE_ID,
-        "q" : query,
-        "num": num_results,
-    }
-    
-    try:
-        response = requests.get(url, params=params)
-        response.raise_for_status()
-        results = response.json()
-        
-        if "items" in results and results["items"]:
-            return [
-                {
-                    "title": item.get("title"),
-                    "snippet": item.get("snippet"),
-                    "link": item.get("link"),
-                }
-                for item in results["items"]
-            ]
-        else:
-            return []
-    except requests.exceptions.RequestException as e:
-        return {"error": str(e)}
+    return search_client.search(query, num_results)
+
+async def agoogle_search(query: str, num_results = 1) -> list:
+    return await search_client.asearch(query, num_results)
     
 # --- Step 3: Generate Response ---
-def generate_response(prompt: str, classification: str, search_results=None) -> str:
-    if classification == "simple":
-        model = "llama-3.3-70b-versatile"
-        full_prompt = prompt
-    elif classification == "reasoning":
-        model = "openai/gpt-oss-120b"
-        full_prompt = prompt
-    elif classification == "internet_search":
-        model = "openai/gpt-oss-20b"
+def build_generation_prompt(prompt: str, classification: str, search_results=None) -> str:
+    full_prompt = prompt
+    if classification == "internet_search":
         # Convert each search result dict to a readable string 
         if search_results:
             search_context = "\n".join(
@@ -102,8 +273,12 @@ def generate_response(prompt: str, classification: str, search_results=None) ->
         {search_context}
         Query: {prompt}        
         """
-    client = create_groq(model=model)    
-    response = client.invoke([{"role":"user", "content": full_prompt}])
+    return full_prompt
+
+def generate_response(prompt: str, classification: str, search_results=None) -> str:
+    full_prompt = build_generation_prompt(prompt, classification, search_results)
+    model = registry.choose(MODEL_ROUTES[classification], estimate_tokens(full_prompt, completion_tokens=0))
+    response = registry.invoke(model, [{"role":"user", "content": full_prompt}])
     
     return response.content, model
 
@@ -119,19 +294,215 @@ def handle_prompt(prompt: str) -> dict:
         
     answer, model = generate_response(prompt, classification, search_results)
     
-    return {"classification": classification, "response": answer, "model": model}
+    return {"classification": classification, "classified_by": classification_result["source"],
+            "response": answer, "model": model}
+
+# --- Step 5: Async pipeline ---
+# Classification, search and generation overlap: the search starts before
+# classification finishes whenever the prompt might need it, and answer
+# tokens are streamed as they arrive.
+
+SPECULATIVE_SEARCH_THRESHOLD = 0.25
+
+async def aclassify_prompt(prompt: str) -> dict:
+    classification = classify_locally(prompt)
+    if classification is not None:
+        return {"classification": classification, "source": "local"}
+    response = await registry.ainvoke(CLASSIFIER_MODEL, llm_classification_messages(prompt))
+    return {"classification": parse_classification(response.content), "source": "llm"}
+
+def should_prefetch_search(prompt: str) -> bool:
+    """Whether a prompt is likely enough to need web results to start searching early."""
+    if SEARCH_RULE.search(prompt):
+        return True
+    return local_classifier.probabilities(prompt)["internet_search"] >= SPECULATIVE_SEARCH_THRESHOLD
+
+async def ahandle_prompt(prompt: str, on_token=None) -> dict:
+    """
+    Async version of `handle_prompt` with speculative search and streamed generation.
+
+    Args:
+        prompt: The user prompt.
+        on_token: Optional callback receiving each generated text chunk.
+
+    Returns:
+        The `handle_prompt` result plus total latency, time to first token
+        and whether a speculative search was wasted.
+    """
+    started = time.perf_counter()
+    search_task = asyncio.create_task(agoogle_search(prompt)) if should_prefetch_search(prompt) else None
+    try:
+        classification_result = await aclassify_prompt(prompt)
+    except BaseException:
+        if search_task:
+            search_task.cancel()
+        raise
+    classification = classification_result["classification"]
+
+    search_results = None
+    wasted_search = False
+    if classification == "internet_search":
+        search_results = await (search_task or agoogle_search(prompt))
+    elif search_task:
+        # The worker thread finishes in the background and still fills the cache.
+        search_task.cancel()
+        wasted_search = True
+
+    full_prompt = build_generation_prompt(prompt, classification, search_results)
+    model = registry.choose(MODEL_ROUTES[classification], estimate_tokens(full_prompt, completion_tokens=0))
+    chunks = []
+    first_token = None
+    async for chunk in registry.astream(model, [{"role": "user", "content": full_prompt}]):
+        if not chunk.content:
+            continue
+        if first_token is None:
+            first_token = time.perf_counter() - started
+        chunks.append(chunk.content)
+        if on_token:
+            on_token(chunk.content)
+
+    return {
+        "classification": classification,
+        "classified_by": classification_result["source"],
+        "response": "".join(chunks),
+        "model": model,
+        "latency": time.perf_counter() - started,
+        "time_to_first_token": first_token,
+        "wasted_search": wasted_search,
+    }
+
+async def ahandle_many(prompts: list[str], concurrency: int = 8) -> list[dict]:
+    """Run `ahandle_prompt` over many prompts with at most `concurrency` in flight, keeping order."""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def run(prompt: str) -> dict:
+        async with semaphore:
+            try:
+                return await ahandle_prompt(prompt)
+            except Exception as e:
+                return {"prompt": prompt, "error": str(e)}
+
+    return await asyncio.gather(*(run(prompt) for prompt in prompts))
+
+def benchmark_pipeline(prompts: list[str], concurrency: int = 8) -> None:
+    """Compare per-prompt latency and wall time of the sequential and async pipelines."""
+    def summary(name, latencies, wall):
+        print(f"{name:>10}: p50 {percentile(latencies, 50) * 1000:7.0f} ms  "
+              f"p95 {percentile(latencies, 95) * 1000:7.0f} ms  wall {wall:6.2f} s")
+
+    # Searches are cached, so give every run of every prompt its own query.
+    latencies = []
+    start = time.perf_counter()
+    for i, prompt in enumerate(prompts):
+        t = time.perf_counter()
+        handle_prompt(f"{prompt} (sequential {i})")
+        latencies.append(time.perf_counter() - t)
+    summary("sequential", latencies, time.perf_counter() - start)
+
+    start = time.perf_counter()
+    results = asyncio.run(ahandle_many([f"{prompt} (async {i})" for i, prompt in enumerate(prompts)], concurrency))
+    wall = time.perf_counter() - start
+    ok = [r for r in results if "error" not in r]
+    summary("async", [r["latency"] for r in ok], wall)
+    print(f"{'':>10}  time to first token p50 "
+          f"{percentile([r['time_to_first_token'] or r['latency'] for r in ok], 50) * 1000:.0f} ms, "
+          f"{sum(r['wasted_search'] for r in ok)} wasted speculative searches, "
+          f"{len(results) - len(ok)} errors")
+
+# --- Classifier benchmark ---
+
+CLASSIFIER_BENCHMARK = [
+    ("What is the capital of Canada?", "simple"),
+    ("Who discovered gravity?", "simple"),
+    ("How many planets are in the solar system?", "simple"),
+    ("What is the plural of mouse?", "simple"),
+    ("Which animal is known as the king of the jungle?", "simple"),
+    ("What colour do you get by mixing blue and yellow?", "simple"),
+    ("What is 17 times 23?", "reasoning"),
+    ("Explain how vaccines train the immune system.", "reasoning"),
+    ("Why does ice float on water?", "reasoning"),
+    ("Compare Python and Rust for systems programming.", "reasoning"),
+    ("How would you schedule five meetings with these constraints?", "reasoning"),
+    ("What are the implications of rising sea levels for coastal cities?", "reasoning"),
+    ("Who won the election yesterday?", "internet_search"),
+    ("Is it going to rain in Paris this weekend?", "internet_search"),
+    ("What is the latest version of Python?", "internet_search"),
+    ("What's the score of the Lakers game tonight?", "internet_search"),
+    ("Current inflation rate in the US?", "internet_search"),
+    ("When is the 2026 World Cup final?", "internet_search"),
+]
 
-#test_prompt = "What is the Capital of Australia?"
-#test_prompt = "Explain the impact of quantum computing on cryptography."
-test_prompt = "When does the australian open 2026 start, give me full date?"
+def benchmark_classifier(rounds: int = 500, live: bool = False) -> None:
+    """
+    Measure local coverage, accuracy and latency, and the LLM calls and spend it avoids.
 
-result = handle_prompt(test_prompt)
-print("Classification:", result["classification"])
-print("Model Used:", result["model"])
-print("Response:\n", result["response"]) 
+    With `live`, every prompt is also classified by CLASSIFIER_MODEL to
+    measure the LLM-only baseline's latency.
+    """
+    decisions = [classify_locally(text) for text, _ in CLASSIFIER_BENCHMARK]
+    covered = [(d, label) for d, (_, label) in zip(decisions, CLASSIFIER_BENCHMARK) if d is not None]
+    correct = sum(d == label for d, label in covered)
+    for (text, label), decision in zip(CLASSIFIER_BENCHMARK, decisions):
+        print(f"  {label:>15} -> {decision or 'LLM':>15}  {text}")
 
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, _ in CLASSIFIER_BENCHMARK:
+            classify_locally(text)
+    local_latency = (time.perf_counter() - start) / (rounds * len(CLASSIFIER_BENCHMARK))
 
+    cost_per_call = sum(
+        registry.estimate_cost(CLASSIFIER_MODEL,
+                               estimate_tokens(json.dumps(llm_classification_messages(text)), completion_tokens=0),
+                               output_tokens=10)
+        for text, _ in CLASSIFIER_BENCHMARK) / len(CLASSIFIER_BENCHMARK)
+    avoided = len(covered) / len(decisions)
+    print(f"\nHandled locally: {len(covered)}/{len(decisions)} ({avoided:.0%}), "
+          f"LLM fallbacks: {len(decisions) - len(covered)}")
+    print(f"Local accuracy: {correct}/{len(covered)} ({correct / max(len(covered), 1):.0%})")
+    print(f"Local latency: {local_latency * 1e6:.1f} us/prompt")
+    print(f"Estimated classifier spend per 1000 prompts: ${cost_per_call * 1000:.4f} LLM-only, "
+          f"${cost_per_call * 1000 * (1 - avoided):.4f} with the local tier")
 
+    if live:
+        latencies = []
+        for text, _ in CLASSIFIER_BENCHMARK:
+            start = time.perf_counter()
+            registry.invoke(CLASSIFIER_MODEL, llm_classification_messages(text))
+            latencies.append(time.perf_counter() - start)
+        latencies.sort()
+        print(f"LLM classifier latency: p50 {latencies[len(latencies) // 2] * 1000:.0f} ms, "
+              f"mean {sum(latencies) / len(latencies) * 1000:.0f} ms")
 
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Resource-aware prompt routing example.")
+    parser.add_argument("--benchmark-classifier", action="store_true",
+                        help="Benchmark the local classifier tier instead of running the demo.")
+    parser.add_argument("--live", action="store_true",
+                        help="With --benchmark-classifier, also time the LLM classifier.")
+    parser.add_argument("--benchmark-pipeline", action="store_true",
+                        help="Compare sequential and async pipeline latency on the benchmark prompts.")
+    parser.add_argument("--stream", action="store_true", help="Run the demo through the async pipeline.")
+    parser.add_argument("--concurrency", type=int, default=8, help="Prompts in flight in async mode.")
+    args = parser.parse_args()
 
+    if args.benchmark_classifier:
+        benchmark_classifier(live=args.live)
+    elif args.benchmark_pipeline:
+        benchmark_pipeline([text for text, _ in CLASSIFIER_BENCHMARK] * 3, args.concurrency)
+        print("Model usage:", json.dumps(registry.stats(), indent=2))
+    elif args.stream:
+        test_prompt = "When does the australian open 2026 start, give me full date?"
+        result = asyncio.run(ahandle_prompt(test_prompt, on_token=lambda text: print(text, end="", flush=True)))
+        print(f"\n\nClassification: {result['classification']} ({result['classified_by']}), "
+              f"model: {result['model']}, first token after {result['time_to_first_token']:.2f}s")
+    else:
+        #test_prompt = "What is the Capital of Australia?"
+        #test_prompt = "Explain the impact of quantum computing on cryptography."
+        test_prompt = "When does the australian open 2026 start, give me full date?"
 
+        result = handle_prompt(test_prompt)
+        print("Classification:", result["classification"], f"({result['classified_by']})")
+        print("Model Used:", result["model"])
+        print("Response:\n", result["response"])
+        print("Model usage:", json.dumps(registry.stats(), indent=2))
@@ -1,31 +1,46 @@
 import os 
+import argparse
+import asyncio
+import json
+import math
+import re
+import sys
+import time
+from collections import Counter, defaultdict
+from itertools import islice
+from typing import Optional
 from langchain_groq import ChatGroq
 from langchain_core.prompts import ChatPromptTemplate
 from langchain_core.output_parsers import StrOutputParser
-from langchain_core.runnables import RunnablePassthrough, RunnableBranch
+from langchain_core.runnables import RunnablePassthrough, RunnableBranch, RunnableLambda
 from dotenv import load_dotenv
+from llm_cache import get_llm_cache
 load_dotenv()
 
 GROQ_API_KEY = os.getenv("GROQ_API_KEY")
 
 llm = ChatGroq(
     model = "llama-3.1-8b-instant",
-    max_tokens=512
+    max_tokens=512,
+    cache=get_llm_cache(),
 )
 
-def booking_handler(request: str) -> str:
+def booking_handler(request: str, verbose: bool = True) -> str:
     """Simulates the booking Agent handling a request"""
-    print("\n-- Delegating to booking handler ---")
+    if verbose:
+        print("\n-- Delegating to booking handler ---")
     return f"Booking Handler processed request: '{request}', Result: Simulated booking action."
 
-def info_handler(request: str) -> str:
+def info_handler(request: str, verbose: bool = True) -> str:
     """Simulates the info agent handling a request."""
-    print("\n-- Delegating to Info Handler")
+    if verbose:
+        print("\n-- Delegating to Info Handler")
     return f"Info Handler processed request: '{request}'. Result: Simulated Information retrieval"
 
-def unclear_handler(request: str) -> str:
+def unclear_handler(request: str, verbose: bool = True) -> str:
     """Handles request that couldnt be delegated. """
-    print("\n-- Handling Unclear request")
+    if verbose:
+        print("\n-- Handling Unclear request")
     return f"Coordinator could not delegate request: '{request}'. Please Clarify"
 
 coordinator_router_prompt = ChatPromptTemplate.from_messages([
@@ -39,8 +54,134 @@ coordinator_router_prompt = ChatPromptTemplate.from_messages([
    ("user", "{request}")
 ])
 
+# --- Local fast-path router
+# Most requests can be classified without a model round trip: keyword rules
+# catch the obvious ones and a TF-IDF nearest-centroid model trained on the
+# labeled examples below handles close paraphrases. Anything the local
+# router is not confident about still goes to the LLM.
+
+DECISIONS = ("booker", "info", "unclear")
+
+# Fires only on travel nouns: "book" or "reserve" alone also covers tables,
+# novels and parking spots, so those requests go to the centroid model.
+BOOKING_RULE = re.compile(
+    r"\b(flights?|hotels?|motels?|hostels?|resorts?|airfare|plane tickets?|accommodation|"
+    r"check[- ]in|round[- ]trip|one[- ]way)\b", re.IGNORECASE)
+BOOKING_VERB = re.compile(r"\b(book|booking|reserve|reservation)\b", re.IGNORECASE)
+INFO_RULE = re.compile(
+    r"^\s*(what|who|when|where|which|why|how|explain|define)\b"
+    r"|\b(capital of|population of|meaning of|definition of|history of)\b", re.IGNORECASE)
+
+LABELED_EXAMPLES = [
+    ("Book me a flight to London.", "booker"),
+    ("I need a hotel room in Paris for two nights.", "booker"),
+    ("Upgrade my flight to business class.", "booker"),
+    ("Can you get me plane tickets to Tokyo next week?", "booker"),
+    ("Find me a cheap hotel near the airport.", "booker"),
+    ("Book a round-trip flight from Lagos to Accra.", "booker"),
+    ("I want to reserve a suite at the Hilton.", "booker"),
+    ("Get me on the earliest flight to New York tomorrow.", "booker"),
+    ("Please arrange accommodation in Rome for the conference.", "booker"),
+    ("Schedule a one-way flight to Berlin on Friday.", "booker"),
+    ("What is the capital of Italy?", "info"),
+    ("Who wrote Pride and Prejudice?", "info"),
+    ("How tall is Mount Everest?", "info"),
+    ("When did the Second World War end?", "info"),
+    ("What is the population of Nigeria?", "info"),
+    ("Explain how photosynthesis works.", "info"),
+    ("Which planet is closest to the sun?", "info"),
+    ("Define the word serendipity.", "info"),
+    ("Why is the sky blue?", "info"),
+    ("Where is the Eiffel Tower located?", "info"),
+    ("asdf qwerty", "unclear"),
+    ("Hmm, not sure.", "unclear"),
+    ("Do the thing.", "unclear"),
+    ("Help", "unclear"),
+    ("I was wondering about stuff", "unclear"),
+    ("Can you handle it for me?", "unclear"),
+    ("Tell me about quantum physics.", "unclear"),
+    ("Something about that thing from before", "unclear"),
+    ("Order me a pizza with extra cheese.", "unclear"),
+    ("Book my car in for a service.", "unclear"),
+]
+
+def tokenize(text: str) -> list[str]:
+    return re.findall(r"[a-z0-9]+", text.lower())
+
+class CentroidRouter:
+    """TF-IDF nearest-centroid classifier trained from (text, label) examples."""
+
+    def __init__(self, examples: list[tuple[str, str]], min_similarity: float = 0.2,
+                 min_margin: float = 0.15):
+        self.min_similarity = min_similarity
+        self.min_margin = min_margin
+        documents = [Counter(tokenize(text)) for text, _ in examples]
+        document_frequency = Counter(term for doc in documents for term in doc)
+        self.idf = {term: math.log((1 + len(documents)) / (1 + df)) + 1
+                    for term, df in document_frequency.items()}
+        sums = {}
+        for doc, (_, label) in zip(documents, examples):
+            centroid = sums.setdefault(label, Counter())
+            for term, weight in self._vectorize(doc).items():
+                centroid[term] += weight
+        self.centroids = {label: self._normalize(vector) for label, vector in sums.items()}
+
+    def _vectorize(self, counts: Counter) -> dict:
+        return self._normalize({term: tf * self.idf[term] for term, tf in counts.items() if term in self.idf})
+
+    @staticmethod
+    def _normalize(vector: dict) -> dict:
+        norm = math.sqrt(sum(w * w for w in vector.values())) or 1.0
+        return {term: w / norm for term, w in vector.items()}
+
+    def predict(self, text: str) -> tuple[Optional[str], float]:
+        """Return the closest label and its margin over the runner-up, or (None, 0.0) if unsure."""
+        vector = self._vectorize(Counter(tokenize(text)))
+        scores = sorted(
+            ((sum(w * centroid.get(term, 0.0) for term, w in vector.items()), label)
+             for label, centroid in self.centroids.items()),
+            reverse=True,
+        )
+        (best, label), runner_up = scores[0], scores[1][0] if len(scores) > 1 else 0.0
+        margin = best - runner_up
+        if best < self.min_similarity or margin < self.min_margin:
+            return None, margin
+        return label, margin
+
+centroid_router = CentroidRouter(LABELED_EXAMPLES)
+
+def classify_request(request: str) -> Optional[str]:
+    """
+    Classify a request locally, or return None when the LLM should decide.
+
+    Keyword rules win when exactly one of them fires; otherwise the
+    nearest-centroid model answers if its margin is large enough. A booking
+    verb with no travel noun ("book a table") is left to the LLM, since the
+    model would send it to 'booker' on the verb alone.
+    """
+    booking = bool(BOOKING_RULE.search(request))
+    info = bool(INFO_RULE.search(request))
+    if booking != info:
+        return "booker" if booking else "info"
+    label, _ = centroid_router.predict(request)
+    if label == "booker" and not booking and BOOKING_VERB.search(request):
+        return None
+    return label
+
+def normalize_decision(text: str) -> str:
+    """Map raw router output to one of DECISIONS, defaulting to 'unclear'."""
+    decision = text.strip().strip("'\".").lower()
+    return decision if decision in DECISIONS else "unclear"
+
 if llm:
-    coordinator_router_chain = coordinator_router_prompt | llm | StrOutputParser()
+    llm_router_chain = coordinator_router_prompt | llm | StrOutputParser() | normalize_decision
+
+def route(inputs: dict):
+    decision = classify_request(inputs["request"])
+    # Returning a runnable makes RunnableLambda invoke it with the same input.
+    return decision if decision is not None else llm_router_chain
+
+coordinator_router_chain = RunnableLambda(route)
     
 branches = {
     "booker" : RunnablePassthrough.assign(output=lambda x: booking_handler(x['request']['request'])),
@@ -51,8 +192,8 @@ branches = {
 }
 
 delegation_branch = RunnableBranch(
-    (lambda x: x['decision'].strip() == 'booker', branches["booker"]),
-    (lambda x: x['decision'].strip() == 'info', branches["info"]),
+    (lambda x: x['decision'] == 'booker', branches["booker"]),
+    (lambda x: x['decision'] == 'info', branches["info"]),
     branches["unclear"] 
 )
 
@@ -81,5 +222,170 @@ def main():
     result_c = coordinator_agent.invoke({"request": request_c})
     print(f"Final Result C: {result_c}")
 
+# --- Batch mode
+
+HANDLERS = {"booker": booking_handler, "info": info_handler, "unclear": unclear_handler}
+
+async def classify_many(requests: list[str], concurrency: int) -> list[tuple[str, Optional[str]]]:
+    """
+    Classify requests concurrently, returning (decision, error) in input order.
+
+    The local router answers first; only its fallbacks are sent to the LLM,
+    with at most `concurrency` calls in flight to respect provider rate limits.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def classify(request: str) -> tuple[str, Optional[str]]:
+        decision = classify_request(request)
+        if decision is not None:
+            return decision, None
+        async with semaphore:
+            try:
+                return await llm_router_chain.ainvoke({"request": request}), None
+            except Exception as e:
+                return "unclear", str(e)
+
+    return await asyncio.gather(*(classify(request) for request in requests))
+
+def handle_group(decision: str, requests: list[str]) -> list[str]:
+    """Run one handler over every request routed to it."""
+    print(f"-- Delegating {len(requests)} request(s) to the '{decision}' handler", file=sys.stderr)
+    handler = HANDLERS[decision]
+    return [handler(request, verbose=False) for request in requests]
+
+async def process_records(records: list[dict], concurrency: int) -> list[dict]:
+    """Classify a window of records, handle each decision group in bulk, keep input order."""
+    decisions = await classify_many([record["request"] for record in records], concurrency)
+    groups = defaultdict(list)
+    for position, (decision, _) in enumerate(decisions):
+        groups[decision].append(position)
+
+    outputs = [None] * len(records)
+    for decision, positions in groups.items():
+        results = handle_group(decision, [records[p]["request"] for p in positions])
+        for position, output in zip(positions, results):
+            outputs[position] = output
+
+    results = []
+    for record, (decision, error), output in zip(records, decisions, outputs):
+        result = {**record, "decision": decision, "output": output}
+        if error:
+            result["error"] = error
+        results.append(result)
+    return results
+
+def parse_record(line: str) -> dict:
+    """Parse one input line, raising ValueError unless it is an object with a string "request"."""
+    record = json.loads(line)
+    if not isinstance(record, dict) or not isinstance(record.get("request"), str):
+        raise ValueError('expected a JSON object with a string "request" field')
+    return record
+
+async def run_batch(infile, outfile, concurrency: int = 16, window: int = 5000) -> int:
+    """
+    Route a JSON Lines stream of {"request": ...} records and write results in input order.
+
+    Records are read `window` lines at a time so memory stays bounded on
+    large inputs; within a window, classification runs concurrently. Blank
+    lines are skipped. A line that cannot be parsed is written out as
+    {"line": n, "error": ...} in its place instead of stopping the batch.
+
+    Returns:
+        int: The number of records processed, including ones that failed to parse.
+    """
+    processed = 0
+    line_number = 0
+    while True:
+        lines = list(islice(infile, window))
+        if not lines:
+            break
+        entries = []  # (line number, record or None, parse error)
+        for line in lines:
+            line_number += 1
+            if not line.strip():
+                continue
+            try:
+                entries.append((line_number, parse_record(line), None))
+            except ValueError as e:
+                entries.append((line_number, None, str(e)))
+        records = [record for _, record, _ in entries if record is not None]
+        results = iter(await process_records(records, concurrency) if records else [])
+        for number, record, error in entries:
+            result = next(results) if record is not None else {"line": number, "error": error}
+            outfile.write(json.dumps(result) + "\n")
+        outfile.flush()
+        processed += len(entries)
+    return processed
+
+BENCHMARK_EXAMPLES = [
+    ("Could you book two hotel rooms in Madrid?", "booker"),
+    ("I'd like a flight to Cape Town in December.", "booker"),
+    ("Reserve me a room at a beach resort.", "booker"),
+    ("Find flights from Chicago to Denver.", "booker"),
+    ("Book accommodation for the team offsite.", "booker"),
+    ("Get me a ticket on the next flight to Dubai.", "booker"),
+    ("What is the tallest building in the world?", "info"),
+    ("Who discovered penicillin?", "info"),
+    ("How many continents are there?", "info"),
+    ("When was the Eiffel Tower built?", "info"),
+    ("What is the capital of Kenya?", "info"),
+    ("Explain the theory of relativity.", "info"),
+    ("Where do penguins live?", "info"),
+    ("blah blah", "unclear"),
+    ("Do it now.", "unclear"),
+    ("Not sure what I want", "unclear"),
+    # Held out: wording unlike the training examples, including requests
+    # that use booking verbs or travel nouns outside a booking.
+    ("Recommend a good book about history.", "info"),
+    ("I want to book a table at a restaurant.", "unclear"),
+    ("Reserve a parking spot downtown.", "unclear"),
+    ("Can you sort out something to read about Lisbon?", "info"),
+    ("Can you sort out somewhere to stay in Lisbon?", "booker"),
+    ("How do hotels set their prices?", "info"),
+    ("Who flew the first commercial flight?", "info"),
+    ("Is it cheaper to fly or take the train to Paris?", "info"),
+    ("Cancel my gym membership.", "unclear"),
+    ("We need two seats on a plane to Nairobi on Monday.", "booker"),
+]
+
+def benchmark_router(rounds: int = 2000) -> None:
+    """Measure local coverage, accuracy on the covered requests and throughput."""
+    decisions = [classify_request(text) for text, _ in BENCHMARK_EXAMPLES]
+    covered = [(d, label) for d, (_, label) in zip(decisions, BENCHMARK_EXAMPLES) if d is not None]
+    correct = sum(d == label for d, label in covered)
+    for (text, label), decision in zip(BENCHMARK_EXAMPLES, decisions):
+        print(f"  {label:>7} -> {decision or 'LLM':>7}  {text}")
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for text, _ in BENCHMARK_EXAMPLES:
+            classify_request(text)
+    elapsed = time.perf_counter() - start
+    calls = rounds * len(BENCHMARK_EXAMPLES)
+
+    print(f"\nHandled locally: {len(covered)}/{len(decisions)} "
+          f"({len(covered) / len(decisions):.0%}), LLM fallbacks: {len(decisions) - len(covered)}")
+    print(f"Local accuracy: {correct}/{len(covered)} ({correct / max(len(covered), 1):.0%})")
+    print(f"Throughput: {calls / elapsed:,.0f} requests/s ({elapsed / calls * 1e6:.1f} us/request)")
+
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Coordinator routing example.")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Benchmark the local fast-path router instead of running the demo.")
+    parser.add_argument("--batch", metavar="JSONL",
+                        help="Route every {\"request\": ...} line of this file ('-' for stdin).")
+    parser.add_argument("--output", metavar="JSONL", help="Where to write batch results (default stdout).")
+    parser.add_argument("--concurrency", type=int, default=16, help="Maximum in-flight LLM calls.")
+    parser.add_argument("--window", type=int, default=5000, help="Records read per batch window.")
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark_router()
+    elif args.batch:
+        infile = sys.stdin if args.batch == "-" else open(args.batch)
+        outfile = open(args.output, "w") if args.output else sys.stdout
+        with infile, outfile:
+            count = asyncio.run(run_batch(infile, outfile, args.concurrency, args.window))
+        print(f"Processed {count} requests.", file=sys.stderr)
+    else:
+        main()
\ No newline at end of file
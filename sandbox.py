@@ -0,0 +1,286 @@
+# Execution-based verification for generated code.
+# Code runs in a separate Python process (python -I, empty temp directory,
+# stripped environment) under CPU, memory, file-size and wall clock limits,
+# against a list of assert-style test cases. Filesystem and network
+# isolation come from bubblewrap or an unprivileged user namespace
+# (`unshare`) when the host allows one; without either, the code can read
+# and write anything the current user can.
+
+import functools
+import json
+import os
+import re
+import shutil
+import subprocess
+import sys
+import tempfile
+from typing import Optional
+
+# Results go to a file descriptor opened by the parent on an unlinked file
+# outside the working directory, not to stdout, so code that prints a fake
+# report is not mistaken for a pass. The solution runs in the same process
+# as the harness, so this guards against accidents, not a hostile solution.
+HARNESS = r'''
+import json, os, sys, traceback
+
+results_fd = int(sys.argv[1])
+cpu_seconds, memory_mb, file_mb = (int(v) for v in sys.argv[2:5])
+try:
+    import resource
+except ImportError:  # Not available on Windows; only the timeout applies there.
+    resource = None
+if resource is not None:
+    # Set here rather than in a preexec_fn, which is unsafe when run_tests is
+    # called from several threads.
+    resource.setrlimit(resource.RLIMIT_CPU, (cpu_seconds, cpu_seconds))
+    resource.setrlimit(resource.RLIMIT_AS, (memory_mb * 1024 * 1024,) * 2)
+    resource.setrlimit(resource.RLIMIT_FSIZE, (file_mb * 1024 * 1024,) * 2)
+    resource.setrlimit(resource.RLIMIT_CORE, (0, 0))
+
+def raises(exception, func, *args, **kwargs):
+    """True if func(*args, **kwargs) raises `exception`."""
+    try:
+        func(*args, **kwargs)
+    except exception:
+        return True
+    return False
+
+namespace = {"__name__": MODULE_NAME, "raises": raises}
+if namespace["__name__"] == "__main__":
+    # Hide the harness's own arguments from a script that reads sys.argv.
+    sys.argv = ["solution.py"]
+results = []
+try:
+    with open("solution.py") as f:
+        exec(compile(f.read(), "solution.py", "exec"), namespace)
+except SystemExit as e:
+    if e.code not in (None, 0):
+        results.append({"test": "<import solution>", "ok": False, "error": f"SystemExit: {e.code}"})
+except BaseException as e:
+    results.append({"test": "<import solution>", "ok": False,
+                    "error": "".join(traceback.format_exception_only(type(e), e)).strip()})
+if not results:
+    with open("tests.json") as f:
+        tests = json.load(f)
+    for test in tests:
+        try:
+            exec(compile(test, "<test>", "exec"), namespace)
+            results.append({"test": test, "ok": True, "error": None})
+        except BaseException as e:
+            results.append({"test": test, "ok": False,
+                            "error": "".join(traceback.format_exception_only(type(e), e)).strip() or type(e).__name__})
+with os.fdopen(results_fd, "w") as f:
+    json.dump(results, f)
+'''
+
+# Run inside `unshare --user --map-root-user --mount --net`: make every
+# mount read-only, hide home directories that do not hold the interpreter,
+# then re-enable writes in the working directory only ($1).
+UNSHARE_SCRIPT = r'''
+for mount_point in $(awk '{print $2}' /proc/self/mounts); do
+    mount -o remount,bind,ro "$mount_point" 2>/dev/null || true
+done
+for hidden in $HIDE_DIRS; do
+    mount -t tmpfs -o ro none "$hidden" 2>/dev/null || true
+done
+mount --bind "$1" "$1" && mount -o remount,bind,rw "$1" && cd "$1" || exit 97
+shift
+exec "$@"
+'''
+
+def extract_code(text: str) -> str:
+    """Return the first fenced code block in `text`, or the whole text if there is none."""
+    match = re.search(r"```(?:python|py)?[^\n]*\n(.*?)```", text, re.DOTALL | re.IGNORECASE)
+    return (match.group(1) if match else text).strip()
+
+def _hidden_dirs() -> list[str]:
+    """Home directories to mask, skipping any that contain the interpreter."""
+    executable = os.path.realpath(sys.executable)
+    return [d for d in ("/root", "/home") if os.path.isdir(d) and not executable.startswith(d + os.sep)]
+
+@functools.lru_cache(maxsize=None)
+def isolation_method() -> str:
+    """"bwrap", "unshare" or "none", whichever this host supports."""
+    if shutil.which("bwrap"):
+        probe = ["bwrap", "--ro-bind", "/", "/", "--unshare-all", "true"]
+        if subprocess.run(probe, capture_output=True).returncode == 0:
+            return "bwrap"
+    if shutil.which("unshare"):
+        probe = ["unshare", "--user", "--map-root-user", "--mount", "--net", "true"]
+        if subprocess.run(probe, capture_output=True).returncode == 0:
+            return "unshare"
+    return "none"
+
+def _isolated(command: list[str], workdir: str) -> list[str]:
+    """Wrap `command` so it cannot write outside `workdir` or use the network."""
+    method = isolation_method()
+    if method == "bwrap":
+        wrapper = ["bwrap", "--ro-bind", "/", "/", "--dev", "/dev", "--proc", "/proc",
+                   "--tmpfs", "/tmp"]
+        for hidden in _hidden_dirs():
+            wrapper += ["--tmpfs", hidden]
+        return wrapper + ["--bind", workdir, workdir, "--chdir", workdir,
+                          "--unshare-all", "--die-with-parent", "--"] + command
+    if method == "unshare":
+        return ["unshare", "--user", "--map-root-user", "--mount", "--net",
+                "env", f"HIDE_DIRS={' '.join(_hidden_dirs())}",
+                "sh", "-c", UNSHARE_SCRIPT, "sandbox", workdir] + command
+    return command
+
+def _tail(output, limit: int = 2000) -> str:
+    if isinstance(output, bytes):
+        output = output.decode(errors="replace")
+    return (output or "")[-limit:]
+
+def run_tests(code: str, tests: list[str], timeout: float = 10.0, memory_mb: int = 512,
+              file_mb: int = 10, as_main: bool = False) -> dict:
+    """
+    Run `code` and then each test in a resource-limited subprocess.
+
+    Tests are Python statements, usually `assert` lines, executed in the
+    solution's namespace; `raises(Exc, func, *args)` is available for
+    checking exceptions. A failing test does not stop the others.
+
+    Args:
+        code: Source of the solution module.
+        tests: Test statements.
+        timeout: Wall-clock limit in seconds; the CPU limit is derived from it.
+        memory_mb: Address-space limit for the child process.
+        file_mb: Largest file the child may write.
+        as_main: Run the solution as `__main__`, so a script's own
+            `if __name__ == "__main__":` block executes too.
+
+    Returns:
+        A dict with `passed` (every test ran and succeeded), per-test
+        `results`, `timed_out`, the child's `stdout`/`stderr` tails, and
+        `isolation` ("bwrap", "unshare" or "none", see isolation_method).
+    """
+    with tempfile.TemporaryDirectory(prefix="sandbox_") as workdir, tempfile.TemporaryFile("w+") as report:
+        with open(os.path.join(workdir, "solution.py"), "w") as f:
+            f.write(code)
+        with open(os.path.join(workdir, "tests.json"), "w") as f:
+            json.dump(tests, f)
+        with open(os.path.join(workdir, "harness.py"), "w") as f:
+            f.write(HARNESS.replace("MODULE_NAME", repr("__main__" if as_main else "solution")))
+
+        limits = [str(int(timeout) + 1), str(memory_mb), str(file_mb)]
+        command = _isolated([sys.executable, "-I", "harness.py", str(report.fileno())] + limits, workdir)
+        try:
+            proc = subprocess.run(
+                command,
+                cwd=workdir, env={"PATH": os.defpath, "PYTHONHASHSEED": "0"},
+                stdin=subprocess.DEVNULL, capture_output=True, text=True,
+                timeout=timeout, start_new_session=True, pass_fds=(report.fileno(),),
+            )
+        except subprocess.TimeoutExpired as e:
+            return {"passed": False, "results": [], "timed_out": True,
+                    "stdout": _tail(e.stdout), "stderr": _tail(e.stderr), "isolation": isolation_method()}
+        report.seek(0)
+        payload = report.read()
+
+    try:
+        results = json.loads(payload) if payload else None
+    except json.JSONDecodeError:
+        results = None
+    if results is None:
+        # The harness died before reporting (memory or CPU limit, os._exit, ...).
+        results = [{"test": "<run>", "ok": False,
+                    "error": f"process exited with code {proc.returncode}: {proc.stderr.strip()[-500:]}"}]
+    return {
+        "passed": all(r["ok"] for r in results) and len(results) == len(tests),
+        "results": results,
+        "timed_out": False,
+        "stdout": _tail(proc.stdout),
+        "stderr": _tail(proc.stderr),
+        "isolation": isolation_method(),
+    }
+
+def failure_report(outcome: dict) -> str:
+    """Describe failed tests as a critique the model can act on."""
+    if outcome["timed_out"]:
+        return "The code did not finish within the time limit. Check for infinite loops or blocking input()."
+    lines = ["The code failed these tests:"]
+    for result in outcome["results"]:
+        if not result["ok"]:
+            lines.append(f"- {result['test']}\n  {result['error']}")
+    return "\n".join(lines)
+
+def parse_tests(text: str) -> list[str]:
+    """Pull single-line assert statements out of model output."""
+    tests = []
+    for line in extract_code(text).splitlines():
+        line = line.strip()
+        if line.startswith("assert ") and line not in tests:
+            try:
+                compile(line, "<test>", "exec")
+            except SyntaxError:
+                continue
+            tests.append(line)
+    return tests
+
+def generate_tests(llm, task: str, count: int = 8) -> list[str]:
+    """Ask `llm` for up to `count` one-line assert tests covering the task."""
+    prompt = (
+        f"Write {count} one-line Python assert statements that test a correct solution to this task. "
+        "Cover normal inputs and edge cases. To check that a call raises an exception, write "
+        "`assert raises(SomeError, function_name, arg)`. Do not import anything or define helpers. "
+        f"Return only the assert lines.\n\nTask:\n{task}"
+    )
+    return parse_tests(llm.invoke(prompt).content)[:count]
+
+class ExecutionVerifier:
+    """
+    Callable verifier for ReflectionEngine: runs the code against tests.
+
+    User-supplied tests are authoritative. Model-generated tests can be wrong,
+    so a generated test that fails on `max_strikes` versions of the code that
+    pass every user test is dropped, rather than rejecting correct code
+    forever.
+
+    Args:
+        tests: User-supplied test statements.
+        llm: If given with `task`, adds model-generated tests (generated once).
+        task: Task description used to generate tests.
+        generated: How many tests to ask the model for.
+        timeout: Per-run wall-clock limit in seconds.
+        max_strikes: Failures (with all user tests passing) before a
+            generated test is dropped.
+    """
+
+    def __init__(self, tests: Optional[list[str]] = None, llm=None, task: str = "",
+                 generated: int = 8, timeout: float = 10.0, max_strikes: int = 2):
+        self.user_tests = list(tests or [])
+        self.generated_tests = []
+        if llm is not None and task:
+            self.generated_tests = [t for t in generate_tests(llm, task, generated) if t not in self.user_tests]
+        self.timeout = timeout
+        self.max_strikes = max_strikes
+        self.strikes = {}
+        self.dropped = []
+        self.last_outcome = None
+
+    @property
+    def tests(self) -> list[str]:
+        return self.user_tests + self.generated_tests
+
+    def __call__(self, code: str) -> tuple[bool, str]:
+        """Return (passed, critique) for a generated answer."""
+        self.last_outcome = run_tests(extract_code(code), self.tests, timeout=self.timeout)
+        if self.last_outcome["passed"]:
+            return True, ""
+        results = self.last_outcome["results"]
+        failed = {r["test"] for r in results if not r["ok"]}
+        # "<import solution>" and "<run>" results mean the tests never ran;
+        # they are not test names, so the comparison below rejects them.
+        user_passed = (not self.last_outcome["timed_out"]
+                       and [r["test"] for r in results] == self.tests
+                       and failed <= set(self.generated_tests))
+        if user_passed:
+            for test in failed:
+                self.strikes[test] = self.strikes.get(test, 0) + 1
+                if self.strikes[test] >= self.max_strikes:
+                    self.generated_tests.remove(test)
+                    self.dropped.append(test)
+            if not failed & set(self.generated_tests):
+                return True, ""
+        return False, failure_report(self.last_outcome)
@@ -0,0 +1,391 @@
+# Local vector-store retrieval used by rag.py's research assistant.
+# Documents are chunked, embedded once (embeddings are cached by content hash)
+# and searched through an IVF index over float32 NumPy arrays that is saved
+# as .npy files in a versioned subdirectory and memory-mapped on load.
+
+import argparse
+import hashlib
+import os
+import re
+import shutil
+import sqlite3
+import tempfile
+import time
+import zlib
+
+import numpy as np
+
+TEXT_EXTENSIONS = (".txt", ".md", ".rst")
+INDEX_FILES = ("centroids", "vectors", "ids", "list_offsets")
+# File naming the subdirectory that holds the current index arrays.
+INDEX_POINTER = "CURRENT"
+
+
+def chunk_text(text: str, chunk_words: int = 200, overlap: int = 40) -> list[str]:
+    """Split text into overlapping windows of `chunk_words` words."""
+    words = text.split()
+    step = max(1, chunk_words - overlap)
+    return [" ".join(words[i:i + chunk_words])
+            for i in range(0, max(len(words) - overlap, 1), step) if words[i:i + chunk_words]]
+
+
+class HashingEmbedder:
+    """
+    Local embedder hashing word unigrams and bigrams into a fixed-size vector.
+
+    Needs no model download or network access. Any object with a `name`,
+    a `dim` (vector length) and an `embed(texts) -> (n, dim) float32 array`
+    method can replace it, e.g. a wrapper around a Gemini embedding model.
+    """
+
+    def __init__(self, dim: int = 256):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def embed(self, texts: list[str]) -> np.ndarray:
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        for row, text in enumerate(texts):
+            words = re.findall(r"\w+", text.lower())
+            for feature in words + [f"{a} {b}" for a, b in zip(words, words[1:])]:
+                h = zlib.crc32(feature.encode())
+                vectors[row, h % self.dim] += 1.0 if h & 0x80000000 else -1.0
+        return normalize(vectors)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def kmeans(vectors: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Spherical k-means on unit vectors; returns `k` unit centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=k, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=k) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = normalize(sums)
+    return centroids
+
+
+def assign(vectors: np.ndarray, centroids: np.ndarray, batch: int = 65536) -> np.ndarray:
+    """Index of the nearest centroid (by inner product) for every vector."""
+    return np.concatenate([
+        np.argmax(vectors[i:i + batch] @ centroids.T, axis=1)
+        for i in range(0, len(vectors), batch)
+    ]) if len(vectors) else np.zeros(0, dtype=np.int64)
+
+
+def current_index_dir(directory: str):
+    """Directory holding the current index arrays, or None if no index was saved."""
+    try:
+        with open(os.path.join(directory, INDEX_POINTER)) as f:
+            location = os.path.join(directory, f.read().strip())
+    except FileNotFoundError:
+        # Indexes saved before versioning kept the arrays in `directory` itself.
+        location = directory
+    return location if os.path.exists(os.path.join(location, "ids.npy")) else None
+
+
+class IVFIndex:
+    """
+    Inverted-file ANN index over unit float32 vectors.
+
+    Vectors are clustered around `nlist` centroids and stored contiguously
+    per cluster; a query scans only the `nprobe` clusters whose centroids
+    are closest to it.
+    """
+
+    def __init__(self, centroids, vectors, ids, list_offsets):
+        self.centroids = centroids
+        self.vectors = vectors
+        self.ids = ids
+        self.list_offsets = list_offsets
+
+    @classmethod
+    def build(cls, vectors: np.ndarray, ids: np.ndarray, nlist: int = None,
+              centroids: np.ndarray = None, train_size: int = 100_000) -> "IVFIndex":
+        """
+        Cluster and lay out `vectors`; pass existing `centroids` to skip training.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if centroids is None:
+            nlist = nlist or max(1, int(np.sqrt(len(vectors))))
+            nlist = min(nlist, len(vectors)) or 1
+            rng = np.random.default_rng(0)
+            sample = vectors[rng.choice(len(vectors), size=min(train_size, len(vectors)), replace=False)]
+            centroids = kmeans(sample, nlist) if len(sample) else np.zeros((1, vectors.shape[1]), np.float32)
+        assignment = assign(vectors, centroids)
+        order = np.argsort(assignment, kind="stable")
+        counts = np.bincount(assignment, minlength=len(centroids))
+        list_offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, vectors[order], np.asarray(ids, dtype=np.int64)[order], list_offsets)
+
+    def save(self, directory: str) -> None:
+        """
+        Write the arrays to a new versioned subdirectory, then atomically
+        repoint INDEX_POINTER at it. A concurrent load sees either the old
+        or the new set of arrays, never a mix, and a process that has the
+        previous arrays memory-mapped keeps reading them. Versions older
+        than the previous one are removed.
+        """
+        os.makedirs(directory, exist_ok=True)
+        previous = current_index_dir(directory)
+        version = tempfile.mkdtemp(dir=directory, prefix="ivf-")
+        try:
+            for name in INDEX_FILES:
+                np.save(os.path.join(version, f"{name}.npy"), getattr(self, name))
+            fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=f".{INDEX_POINTER}.")
+            with os.fdopen(fd, "w") as f:
+                f.write(os.path.basename(version))
+            os.replace(tmp_path, os.path.join(directory, INDEX_POINTER))
+        except BaseException:
+            shutil.rmtree(version, ignore_errors=True)
+            raise
+        keep = {version, previous}
+        for entry in os.listdir(directory):
+            path = os.path.join(directory, entry)
+            if entry.startswith("ivf-") and path not in keep:
+                shutil.rmtree(path, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: str, attempts: int = 3) -> "IVFIndex":
+        for attempt in range(attempts):
+            location = current_index_dir(directory)
+            if location is None:
+                raise FileNotFoundError(f"No index in {directory}")
+            try:
+                return cls(**{name: np.load(os.path.join(location, f"{name}.npy"), mmap_mode="r")
+                              for name in INDEX_FILES})
+            except FileNotFoundError:
+                # Two saves ran between reading the pointer and opening the
+                # arrays, and this version was removed; read the pointer again.
+                if attempt == attempts - 1:
+                    raise
+
+    def search(self, query: np.ndarray, k: int = 5, nprobe: int = 8) -> list[tuple[int, float]]:
+        """Return up to `k` (id, score) pairs with the highest inner product."""
+        if len(self.ids) == 0:
+            return []
+        centroid_scores = self.centroids @ query
+        nprobe = min(nprobe, len(self.centroids))
+        probes = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        best_ids, best_scores = [], []
+        for cluster in probes:
+            start, end = self.list_offsets[cluster], self.list_offsets[cluster + 1]
+            if start == end:
+                continue
+            scores = self.vectors[start:end] @ query
+            top = np.argpartition(-scores, min(k, len(scores)) - 1)[:k]
+            best_ids.append(self.ids[start:end][top])
+            best_scores.append(scores[top])
+        if not best_ids:
+            return []
+        ids, scores = np.concatenate(best_ids), np.concatenate(best_scores)
+        order = np.argsort(-scores)[:k]
+        return [(int(ids[i]), float(scores[i])) for i in order]
+
+
+class VectorStore:
+    """
+    Incrementally indexed document store: chunks, embedding cache and IVF index.
+
+    Chunk text, per-source file stamps and embeddings live in SQLite; the
+    IVF arrays live next to it as memory-mapped .npy files. Re-indexing
+    only chunks and embeds files whose mtime or size changed, and embeddings
+    are cached by chunk hash, so edited files mostly reuse their vectors.
+    The IVF layout is then rebuilt from the stored vectors, reusing the
+    trained centroids until the corpus doubles in size.
+
+    Args:
+        directory: Where the SQLite database and index arrays are kept.
+        embedder: Object with a `name` (cache key), a `dim` (vector length)
+            and an `embed(texts) -> (n, dim) float32 array` method.
+            Defaults to HashingEmbedder.
+    """
+
+    def __init__(self, directory: str, embedder=None):
+        self.directory = directory
+        self.embedder = embedder or HashingEmbedder()
+        os.makedirs(directory, exist_ok=True)
+        self.conn = sqlite3.connect(os.path.join(directory, "store.sqlite"), check_same_thread=False)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS sources (path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER);
+            CREATE TABLE IF NOT EXISTS chunks (id INTEGER PRIMARY KEY, source TEXT, position INTEGER,
+                                               hash TEXT, text TEXT);
+            CREATE INDEX IF NOT EXISTS chunks_source ON chunks (source);
+            CREATE TABLE IF NOT EXISTS embeddings (hash TEXT, model TEXT, vector BLOB,
+                                                   PRIMARY KEY (hash, model));
+            CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT);
+        """)
+        self.index = None
+
+    def _embed_cached(self, chunks: list[tuple[str, str]]) -> int:
+        """Embed (hash, text) chunks that are not cached yet; returns how many were embedded."""
+        missing = {}
+        for digest, text in chunks:
+            cached = self.conn.execute("SELECT 1 FROM embeddings WHERE hash = ? AND model = ?",
+                                       (digest, self.embedder.name)).fetchone()
+            if cached is None:
+                missing[digest] = text
+        if missing:
+            vectors = self.embedder.embed(list(missing.values()))
+            self.conn.executemany(
+                "INSERT OR REPLACE INTO embeddings VALUES (?, ?, ?)",
+                [(digest, self.embedder.name, v.tobytes()) for digest, v in zip(missing, vectors)])
+        return len(missing)
+
+    def index_paths(self, paths: list[str], chunk_words: int = 200, overlap: int = 40,
+                    prune: bool = False) -> dict:
+        """
+        Bring the store up to date with the text files under `paths`.
+
+        Sources indexed earlier from other paths are kept. Only files that
+        were indexed under one of `paths` and no longer exist are removed,
+        unless `prune` is set, in which case everything not under `paths`
+        is removed too.
+
+        Returns:
+            dict: Counts of changed, removed and unchanged files and embedded chunks.
+        """
+        roots = [os.path.abspath(path) for path in paths]
+        files = []
+        for root in roots:
+            if os.path.isdir(root):
+                files.extend(os.path.join(directory, name) for directory, _, names in os.walk(root)
+                             for name in sorted(names) if name.endswith(TEXT_EXTENSIONS))
+            elif os.path.exists(root):
+                files.append(root)
+
+        def under_roots(path: str) -> bool:
+            return any(path == root or path.startswith(root.rstrip(os.sep) + os.sep) for root in roots)
+
+        known = {path: (mtime, size) for path, mtime, size in self.conn.execute("SELECT * FROM sources")}
+        stale = {path for path in set(known) - set(files) if prune or under_roots(path)}
+        stats = {"changed": 0, "removed": 0, "unchanged": 0, "embedded": 0}
+        with self.conn:
+            for path in stale:
+                self.conn.execute("DELETE FROM chunks WHERE source = ?", (path,))
+                self.conn.execute("DELETE FROM sources WHERE path = ?", (path,))
+                stats["removed"] += 1
+            for path in files:
+                st = os.stat(path)
+                if known.get(path) == (st.st_mtime_ns, st.st_size):
+                    stats["unchanged"] += 1
+                    continue
+                with open(path, encoding="utf-8", errors="replace") as f:
+                    chunks = chunk_text(f.read(), chunk_words, overlap)
+                self.conn.execute("DELETE FROM chunks WHERE source = ?", (path,))
+                rows = [(path, i, hashlib.sha1(c.encode()).hexdigest(), c) for i, c in enumerate(chunks)]
+                self.conn.executemany(
+                    "INSERT INTO chunks (source, position, hash, text) VALUES (?, ?, ?, ?)", rows)
+                stats["embedded"] += self._embed_cached([(digest, text) for _, _, digest, text in rows])
+                self.conn.execute("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)",
+                                  (path, st.st_mtime_ns, st.st_size))
+                stats["changed"] += 1
+        if stats["changed"] or stats["removed"] or current_index_dir(self.directory) is None:
+            self.rebuild_index()
+        return stats
+
+    def rebuild_index(self) -> None:
+        rows = self.conn.execute(
+            "SELECT chunks.id, embeddings.vector FROM chunks JOIN embeddings"
+            " ON embeddings.hash = chunks.hash AND embeddings.model = ? ORDER BY chunks.id",
+            (self.embedder.name,)).fetchall()
+        ids = np.array([row[0] for row in rows], dtype=np.int64)
+        vectors = (np.frombuffer(b"".join(row[1] for row in rows), dtype=np.float32)
+                   .reshape(len(rows), self.embedder.dim)) if rows else np.zeros((0, self.embedder.dim), np.float32)
+
+        trained_on = self.conn.execute("SELECT value FROM meta WHERE key = 'trained_on'").fetchone()
+        location = current_index_dir(self.directory)
+        centroids = None
+        if trained_on and location is not None and len(ids) <= 2 * int(trained_on[0]):
+            centroids = np.load(os.path.join(location, "centroids.npy"))
+        self.index = IVFIndex.build(vectors, ids, centroids=centroids)
+        self.index.save(self.directory)
+        if centroids is None:
+            with self.conn:
+                self.conn.execute("INSERT OR REPLACE INTO meta VALUES ('trained_on', ?)", (str(max(len(ids), 1)),))
+        self.index = IVFIndex.load(self.directory)
+
+    def search(self, query: str, k: int = 5, nprobe: int = 8) -> list[dict]:
+        """Return the `k` chunks most similar to `query` with their source and score."""
+        if self.index is None:
+            if current_index_dir(self.directory) is None:
+                return []
+            self.index = IVFIndex.load(self.directory)
+        hits = self.index.search(self.embedder.embed([query])[0], k, nprobe)
+        results = []
+        for chunk_id, score in hits:
+            row = self.conn.execute("SELECT source, position, text FROM chunks WHERE id = ?",
+                                    (chunk_id,)).fetchone()
+            if row is not None:
+                results.append({"source": row[0], "position": row[1], "text": row[2], "score": round(score, 4)})
+        return results
+
+
+def benchmark(num_chunks: int = 1_000_000, dim: int = 128, nlist: int = 1024, queries: int = 200,
+              k: int = 10, seed: int = 0) -> None:
+    """Recall@k against exact search and query latency on synthetic clustered vectors."""
+    rng = np.random.default_rng(seed)
+    print(f"Generating {num_chunks} x {dim} vectors...")
+    topics = normalize(rng.standard_normal((4096, dim)).astype(np.float32))
+    vectors = np.empty((num_chunks, dim), dtype=np.float32)
+    for i in range(0, num_chunks, 100_000):
+        n = min(100_000, num_chunks - i)
+        noise = rng.standard_normal((n, dim)).astype(np.float32) * 0.08
+        vectors[i:i + n] = normalize(topics[rng.integers(0, len(topics), n)] + noise)
+    query_vectors = normalize(vectors[rng.integers(0, num_chunks, queries)]
+                              + rng.standard_normal((queries, dim)).astype(np.float32) * 0.05)
+
+    start = time.perf_counter()
+    index = IVFIndex.build(vectors, np.arange(num_chunks), nlist=nlist)
+    print(f"Built IVF index ({nlist} lists) in {time.perf_counter() - start:.1f}s")
+
+    exact, exact_times = [], []
+    for q in query_vectors:
+        start = time.perf_counter()
+        scores = vectors @ q
+        exact.append(set(np.argpartition(-scores, k)[:k].tolist()))
+        exact_times.append(time.perf_counter() - start)
+    print(f"exact      p50 {np.percentile(exact_times, 50) * 1000:7.2f} ms")
+
+    for nprobe in (1, 4, 8, 16, 32):
+        times, hits = [], 0
+        for q, truth in zip(query_vectors, exact):
+            start = time.perf_counter()
+            found = index.search(q, k, nprobe)
+            times.append(time.perf_counter() - start)
+            hits += len(truth & {i for i, _ in found})
+        print(f"nprobe={nprobe:<3} p50 {np.percentile(times, 50) * 1000:7.2f} ms  "
+              f"p95 {np.percentile(times, 95) * 1000:7.2f} ms  recall@{k} {hits / (k * queries):.3f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Index, query or benchmark the local vector store.")
+    sub = parser.add_subparsers(dest="command", required=True)
+    index_cmd = sub.add_parser("index", help="(Re)index text files into a store directory.")
+    index_cmd.add_argument("store")
+    index_cmd.add_argument("paths", nargs="+")
+    index_cmd.add_argument("--prune", action="store_true",
+                           help="Also drop sources indexed earlier from paths not given now.")
+    search_cmd = sub.add_parser("search", help="Query a store.")
+    search_cmd.add_argument("store")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("-k", type=int, default=5)
+    bench_cmd = sub.add_parser("benchmark", help="Recall/latency on synthetic vectors.")
+    bench_cmd.add_argument("--chunks", type=int, default=1_000_000)
+    bench_cmd.add_argument("--dim", type=int, default=128)
+    bench_cmd.add_argument("--nlist", type=int, default=1024)
+    args = parser.parse_args()
+
+    if args.command == "index":
+        print(VectorStore(args.store).index_paths(args.paths, prune=args.prune))
+    elif args.command == "search":
+        for hit in VectorStore(args.store).search(args.query, args.k):
+            print(f"{hit['score']:.3f}  {hit['source']}#{hit['position']}  {hit['text'][:100]}")
+    else:
+        benchmark(args.chunks, args.dim, args.nlist)
@@ -0,0 +1,188 @@
+# Google Custom Search client shared by the agent scripts.
+# Reuses pooled HTTP connections, caches results on disk with a TTL and
+# collapses concurrent identical queries into a single request.
+
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+from typing import Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+DEFAULT_SEARCH_URL = "https://www.googleapis.com/customsearch/v1"
+
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, used as the cache key."""
+    return " ".join(query.lower().split())
+
+
+class SearchCache:
+    """
+    SQLite-backed TTL cache of search results.
+
+    Args:
+        path: SQLite file, or ":memory:" for a per-process cache.
+        ttl: Seconds a cached result stays valid.
+    """
+
+    def __init__(self, path: str = ":memory:", ttl: float = 6 * 3600):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS results ("
+            "key TEXT PRIMARY KEY, results TEXT NOT NULL, created REAL NOT NULL)"
+        )
+        self._conn.commit()
+
+    def get(self, key: str) -> Optional[list]:
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, created FROM results WHERE key = ?", (key,)
+            ).fetchone()
+        if row is None or time.time() - row[1] > self.ttl:
+            return None
+        return json.loads(row[0])
+
+    def set(self, key: str, results: list) -> None:
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO results (key, results, created) VALUES (?, ?, ?)",
+                (key, json.dumps(results), time.time()),
+            )
+            self._conn.commit()
+
+    def purge(self) -> int:
+        """Delete expired rows and return how many were removed."""
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM results WHERE created < ?", (time.time() - self.ttl,))
+            self._conn.commit()
+        return cursor.rowcount
+
+
+class SearchClient:
+    """
+    Google Custom Search client with connection pooling, caching and dedup.
+
+    Results are cached by normalized query and result count. When several
+    threads (or `asearch` calls) ask for the same uncached query at once,
+    only the first one hits the API and the others wait for its result.
+    Failures are reported and returned as an empty list; they are not cached.
+
+    Args:
+        api_key: Custom Search API key.
+        cse_id: Programmable Search Engine id.
+        url: Endpoint, overridable to point at a local stub server.
+        cache: Result cache, or None to always query the API.
+        timeout: (connect, read) timeout in seconds for each request.
+        pool_size: Connections kept open to the search host.
+    """
+
+    def __init__(self, api_key: str, cse_id: str, url: str = DEFAULT_SEARCH_URL,
+                 cache: Optional[SearchCache] = None, timeout=(3.05, 10), pool_size: int = 16):
+        self.api_key = api_key
+        self.cse_id = cse_id
+        self.url = url
+        self.cache = cache
+        self.timeout = timeout
+        self.session = requests.Session()
+        retries = Retry(total=2, backoff_factor=0.3, status_forcelist=(500, 502, 503, 504),
+                        allowed_methods=("GET",))
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size, max_retries=retries)
+        self.session.mount("https://", adapter)
+        self.session.mount("http://", adapter)
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.cache_hits = 0
+        self.deduplicated = 0
+
+    def _fetch(self, query: str, num_results: int) -> Optional[list]:
+        params = {"key": self.api_key, "cx": self.cse_id, "q": query, "num": num_results}
+        self.requests += 1
+        try:
+            response = self.session.get(self.url, params=params, timeout=self.timeout)
+            response.raise_for_status()
+            results = response.json()
+        except (requests.exceptions.RequestException, ValueError) as e:
+            print(f"Search failed for {query!r}: {e}")
+            return None
+        return [
+            {
+                "title": item.get("title"),
+                "snippet": item.get("snippet"),
+                "link": item.get("link"),
+            }
+            for item in results.get("items") or []
+        ]
+
+    def search(self, query: str, num_results: int = 1) -> list:
+        """
+        Search the web, serving repeated queries from the cache.
+
+        Args:
+            query: Search terms.
+            num_results: Number of results to request (the API allows 1-10).
+
+        Returns:
+            A list of {"title", "snippet", "link"} dicts; empty on failure.
+        """
+        key = f"{num_results}:{normalize_query(query)}"
+        if self.cache is not None:
+            cached = self.cache.get(key)
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+
+        with self._lock:
+            future = self._inflight.get(key)
+            leader = future is None
+            if leader:
+                future = self._inflight[key] = Future()
+            else:
+                self.deduplicated += 1
+        if not leader:
+            return future.result()
+
+        results = None
+        try:
+            # A previous leader may have filled the cache since our lookup.
+            if self.cache is not None:
+                results = self.cache.get(key)
+            if results is None:
+                results = self._fetch(query, num_results)
+                if results is not None and self.cache is not None:
+                    self.cache.set(key, results)
+        finally:
+            with self._lock:
+                del self._inflight[key]
+            future.set_result(results or [])
+        return results or []
+
+    async def asearch(self, query: str, num_results: int = 1) -> list:
+        """Async variant of `search`, run on a worker thread."""
+        return await asyncio.to_thread(self.search, query, num_results)
+
+    def stats(self) -> dict:
+        return {"requests": self.requests, "cache_hits": self.cache_hits, "deduplicated": self.deduplicated}
+
+
+def create_search_client(api_key: str, cse_id: str) -> SearchClient:
+    """
+    Build a client configured from the environment.
+
+    Reads GOOGLE_SEARCH_URL (endpoint override), SEARCH_CACHE_PATH (SQLite
+    file, empty for memory only) and SEARCH_CACHE_TTL (seconds).
+    """
+    cache = SearchCache(
+        path=os.getenv("SEARCH_CACHE_PATH", ".search_cache.sqlite") or ":memory:",
+        ttl=float(os.getenv("SEARCH_CACHE_TTL", 6 * 3600)),
+    )
+    return SearchClient(api_key, cse_id, url=os.getenv("GOOGLE_SEARCH_URL", DEFAULT_SEARCH_URL), cache=cache)